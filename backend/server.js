@@ -39,6 +39,9 @@ const PORT = process.env.BACKEND_PORT || 3000;
 // STT and TTS API endpoints - default to localhost, but can be overridden from env vars
 const WHISPER_API_URL = process.env.WHISPER_API_URL || 'http://whisper-api:9000/transcribe'; // Fixed Whisper API endpoint
 const PIPER_API_URL = process.env.COQUI_TTS_API_URL || 'http://coqui-tts-api:5002/api/tts'; // Updated TTS API URL
+// Upstream audio formats a client may pick in its hello message. Raw PCM is always accepted;
+// Opus (length-prefixed packets, decoded by the STT API) can be turned off with UPSTREAM_OPUS_ENABLED=false
+const UPSTREAM_FORMATS = process.env.UPSTREAM_OPUS_ENABLED === 'false' ? ['pcm_s16le'] : ['pcm_s16le', 'opus'];
 // !!! END CONFIGURATION !!!
 
 // Create temp directories for audio processing
@@ -100,26 +103,22 @@ app.post(BACKEND_RESPONSE_WEBHOOK_PATH, async (req, res) => {
                 throw new Error('TTS API response body is empty.');
             }
             
-            // Buffer the complete TTS response before sending
-            const audioChunks = [];
+            // Forward every chunk as it arrives, so the client starts playing after the first sentence
             let chunkCount = 0;
+            let totalBytes = 0;
             
             ttsResponse.body.on('data', (chunk) => {
                 chunkCount++;
-                console.log(`[${sessionId}] Main TTS: Received chunk ${chunkCount}, size: ${chunk.length} bytes`);
-                audioChunks.push(chunk);
+                totalBytes += chunk.length;
+                console.log(`[${sessionId}] Main TTS: Forwarding chunk ${chunkCount}, size: ${chunk.length} bytes`);
+                if (client.readyState === WebSocket.OPEN) {
+                    client.send(chunk);
+                }
             });
             
             ttsResponse.body.on('end', () => {
-                console.log(`[${sessionId}] TTS audio stream finished. Total chunks: ${chunkCount}`);
-                if (client.readyState === WebSocket.OPEN && audioChunks.length > 0) {
-                    // Combine all chunks into a single buffer
-                    const completeAudio = Buffer.concat(audioChunks);
-                    console.log(`[${sessionId}] Sending complete main TTS audio buffer (${completeAudio.length} bytes)`);
-                    
-                    // Send the complete audio as a single message
-                    client.send(completeAudio);
-                    
+                console.log(`[${sessionId}] TTS audio stream finished. Total chunks: ${chunkCount} (${totalBytes} bytes)`);
+                if (client.readyState === WebSocket.OPEN) {
                     // Signal that audio is complete
                     client.send(JSON.stringify({ event: 'audioEnd' }));
                 }
@@ -196,26 +195,22 @@ async function sendDirectResponse(sessionId, text) {
                     throw new Error('TTS API response body is empty.');
                 }
 
-                // Buffer the complete TTS response before sending
-                const audioChunks = [];
+                // Forward every chunk as it arrives, so the client starts playing after the first sentence
                 let chunkCount = 0;
+                let totalBytes = 0;
                 
                 ttsResponse.body.on('data', (chunk) => {
                     chunkCount++;
-                    console.log(`[${sessionId}] Direct response: Received TTS chunk ${chunkCount}, size: ${chunk.length} bytes`);
-                    audioChunks.push(chunk);
+                    totalBytes += chunk.length;
+                    console.log(`[${sessionId}] Direct response: Forwarding TTS chunk ${chunkCount}, size: ${chunk.length} bytes`);
+                    if (client.readyState === WebSocket.OPEN) {
+                        client.send(chunk);
+                    }
                 });
                 
                 ttsResponse.body.on('end', () => {
-                    console.log(`[${sessionId}] Direct response TTS audio stream finished. Total chunks: ${chunkCount}`);
-                    if (client.readyState === WebSocket.OPEN && audioChunks.length > 0) {
-                        // Combine all chunks into a single buffer
-                        const completeAudio = Buffer.concat(audioChunks);
-                        console.log(`[${sessionId}] Sending complete direct response audio buffer (${completeAudio.length} bytes)`);
-                        
-                        // Send the complete audio as a single message
-                        client.send(completeAudio);
-                        
+                    console.log(`[${sessionId}] Direct response TTS audio stream finished. Total chunks: ${chunkCount} (${totalBytes} bytes)`);
+                    if (client.readyState === WebSocket.OPEN) {
                         // Signal that audio is complete
                         client.send(JSON.stringify({ event: 'audioEnd' }));
                     }
@@ -254,14 +249,18 @@ wss.on('connection', (ws, req) => {
     console.log(`[${new Date().toISOString()}] Client connected: ${sessionId} from ${clientIp}`);
 
     // Initialize STT processing for this client
-    initializeSTTForSession(sessionId);
+    initializeSTTForSession(sessionId, clientIp);
 
-    ws.on('message', async (message) => {
-        if (typeof message === 'string') {
+    ws.on('message', async (message, isBinary) => {
+        // ws 8 delivers text frames as Buffers too, so the frame type decides
+        if (!isBinary) {
+            message = message.toString();
             console.log(`[${new Date().toISOString()}] Message (string) from client ${sessionId}: ${message}`);
             try {
                 const command = JSON.parse(message);
-                if (command.event === 'audioEnd') {
+                if (command.event === 'hello') {
+                    negotiateAudioFormat(ws, sessionId, command.audio || {});
+                } else if (command.event === 'audioEnd') {
                     console.log(`[${new Date().toISOString()}] Client ${sessionId} signaled audio end.`);
                     await finalizeSTTForSession(sessionId);
                 }
@@ -287,6 +286,18 @@ wss.on('connection', (ws, req) => {
 
 // --- Helper Functions ---
 
+// Answers a client's hello: the requested upstream format if supported, raw PCM otherwise.
+// Clients that never send a hello keep streaming raw PCM.
+function negotiateAudioFormat(ws, sessionId, requested) {
+    const session = sttProcessors[sessionId];
+    const format = UPSTREAM_FORMATS.includes(requested.format) ? requested.format : 'pcm_s16le';
+    if (session) {
+        session.audioFormat = format;
+    }
+    console.log(`[${new Date().toISOString()}] Client ${sessionId} requested ${requested.format || 'no'} upstream format, using ${format}.`);
+    ws.send(JSON.stringify({ event: 'helloAck', audio: { format: format, sample_rate: 16000, channels: 1 } }));
+}
+
 function generateSessionId() {
     return uuidv4();
 }
@@ -304,9 +315,11 @@ function findWebSocketClient(sessionId) {
 
 let sttProcessors = {};
 
-function initializeSTTForSession(sessionId) {
+function initializeSTTForSession(sessionId, clientId) {
     console.log(`[${new Date().toISOString()}] Initializing STT for session ${sessionId}.`);
     sttProcessors[sessionId] = {
+        clientId: clientId, // Stable per satellite across reconnects (used for the STT language cache)
+        audioFormat: 'pcm_s16le', // Upstream format agreed in the hello handshake
         buffer: [],
         timeoutHandle: null,
         isProcessing: false,
@@ -348,16 +361,18 @@ async function finalizeSTTForSession(sessionId) {
     session.buffer = [];
 
     try {
-        console.log(`[${new Date().toISOString()}] Starting STT processing for session ${sessionId} with ${audioData.length} bytes.`);
-        
-        // Create a temporary file to store the audio
-        const tempFilePath = path.join(TEMP_DIR, `audio_${sessionId}.wav`);
-        await fs.writeFile(tempFilePath, audioData);
-        console.log(`[${sessionId}] Audio saved to temporary file: ${tempFilePath}`);
+        console.log(`[${new Date().toISOString()}] Starting STT processing for session ${sessionId} with ${audioData.length} bytes (${session.audioFormat}).`);
         
-        // Create a proper FormData object with the file
+        // The buffered chunks are 16 kHz mono audio straight from the client: raw s16le PCM, or
+        // length-prefixed Opus packets if negotiated. Declare the format and let the STT API decode them in memory.
+        const extension = session.audioFormat === 'opus' ? 'opus' : 'pcm';
         const formData = new FormData();
-        formData.append('file', fs.createReadStream(tempFilePath));
+        formData.append('file', audioData, { filename: `audio_${sessionId}.${extension}`, contentType: 'application/octet-stream' });
+        formData.append('format', session.audioFormat);
+        formData.append('sample_rate', '16000');
+        if (session.clientId) {
+            formData.append('client_id', session.clientId);
+        }
         
         console.log(`[${sessionId}] Sending audio to STT API: ${WHISPER_API_URL}`);
         const sttResponse = await fetch(WHISPER_API_URL, {
@@ -366,10 +381,6 @@ async function finalizeSTTForSession(sessionId) {
             headers: formData.getHeaders(), // Important: Include the headers from FormData
         });
 
-        // Clean up the temporary file
-        fs.unlink(tempFilePath)
-            .catch(err => console.error(`[${sessionId}] Error deleting temp file: ${err}`));
-
         if (!sttResponse.ok) {
             const errorBody = await sttResponse.text();
             throw new Error(`STT API request failed with status ${sttResponse.status}: ${errorBody}`);
@@ -1,13 +1,37 @@
 \
 import os
 import io
+import functools
 import logging
+import threading
+import time
 import torch # Added
 from torch import serialization # Added
 from typing import Optional # Added
 from fastapi import FastAPI, Response, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+import numpy as np
+
+from audio_encoding import (
+    MEDIA_TYPES,
+    StreamingResampler,
+    create_encoder,
+    float_to_pcm16,
+    media_type,
+    pcm16_to_float32,
+    wav_header,
+)
+from text_utils import normalize_text, split_sentences
+import xtts_streaming
+from speaker_cache import SpeakerLatentCache
+from audio_cache import AudioCache, make_key as make_audio_cache_key
+from inference_pool import InferencePool, QueueFull
+import batching
+from model_registry import ModelLoadError, ModelRegistry
+import cpu_profile
+import bootstrap
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,23 +40,29 @@ logger = logging.getLogger(__name__)
 # Set environment variable to accept license agreement
 os.environ["COQUI_TOS_AGREED"] = "1"
 
-# Attempt to make XttsConfig a safe global for torch.load
-try:
-    from TTS.tts.configs.xtts_config import XttsConfig
-    from TTS.tts.models.xtts import XttsAudioConfig, XttsArgs # Added import for XttsArgs
-    from TTS.config.shared_configs import BaseDatasetConfig
-    serialization.add_safe_globals([XttsConfig, XttsAudioConfig, BaseDatasetConfig, XttsArgs]) # Added XttsArgs
-    logger.info("Successfully added XttsConfig, XttsAudioConfig, BaseDatasetConfig, and XttsArgs to torch safe globals.")
-except ImportError:
-    logger.error("Failed to import one or more classes for torch.serialization.add_safe_globals. Model loading might fail.")
-except AttributeError:
-    logger.error("Failed to call torch.serialization.add_safe_globals. PyTorch version might be too old or API changed.")
-except Exception as e:
-    logger.error(f"An unexpected error occurred while trying to add classes to safe globals: {e}")
+# Startup phases run in the background after the port is bound (see startup_sequence)
+PROCESS_STARTED = time.perf_counter()
 
+@functools.lru_cache(maxsize=None)
+def import_tts():
+    """Imports TTS (several seconds) once, after registering the XTTS config classes for torch.load."""
+    # Attempt to make XttsConfig a safe global for torch.load
+    try:
+        from TTS.tts.configs.xtts_config import XttsConfig
+        from TTS.tts.models.xtts import XttsAudioConfig, XttsArgs # Added import for XttsArgs
+        from TTS.config.shared_configs import BaseDatasetConfig
+        serialization.add_safe_globals([XttsConfig, XttsAudioConfig, BaseDatasetConfig, XttsArgs]) # Added XttsArgs
+        logger.info("Successfully added XttsConfig, XttsAudioConfig, BaseDatasetConfig, and XttsArgs to torch safe globals.")
+    except ImportError:
+        logger.error("Failed to import one or more classes for torch.serialization.add_safe_globals. Model loading might fail.")
+    except AttributeError:
+        logger.error("Failed to call torch.serialization.add_safe_globals. PyTorch version might be too old or API changed.")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while trying to add classes to safe globals: {e}")
 
-# Now import TTS after setting the environment variable
-from TTS.api import TTS
+    # Now import TTS after setting the environment variable
+    from TTS.api import TTS
+    return TTS
 
 # --- Configuration ---
 # Model name or path from environment variable
@@ -40,19 +70,74 @@ from TTS.api import TTS
 # Example standard model: "tts_models/en/ljspeech/tacotron2-DDC"
 DEFAULT_MODEL_NAME = "tts_models/en/ljspeech/tacotron2-DDC" # A faster, standard model as default
 MODEL_NAME = os.environ.get("COQUI_MODEL", DEFAULT_MODEL_NAME)
+# Further models selectable per request with `model` (comma-separated); COQUI_MODEL is the default
+MODELS = [MODEL_NAME] + [name.strip() for name in os.environ.get("COQUI_MODELS", "").split(",") if name.strip()]
+# Combined size of loaded models before the least recently used one is evicted (0: no limit)
+MODEL_MEMORY_MB = float(os.environ.get("TTS_MODEL_MEMORY_MB", "0"))
 # Path to speaker wav for XTTS models (optional, required for XTTS voice cloning)
 SPEAKER_WAV_PATH = os.environ.get("COQUI_SPEAKER_WAV")
 # Language for XTTS models (required if using XTTS)
 LANGUAGE = os.environ.get("COQUI_LANGUAGE", "en")
 # Use CUDA if available
 USE_CUDA = os.environ.get("USE_CUDA", "true").lower() == "true"
+# Longest piece of text synthesized in one call (XTTS degrades above ~250 characters)
+SENTENCE_MAX_CHARS = int(os.environ.get("TTS_SENTENCE_MAX_CHARS", "250"))
+# XTTS incremental decoding: audio is vocoded and streamed every XTTS_STREAM_CHUNK_SIZE
+# GPT tokens and cross-faded with the previous chunk over XTTS_STREAM_OVERLAP samples
+XTTS_STREAMING = os.environ.get("XTTS_STREAMING", "true").lower() == "true"
+XTTS_STREAM_CHUNK_SIZE = int(os.environ.get("XTTS_STREAM_CHUNK_SIZE", "20"))
+XTTS_STREAM_OVERLAP = int(os.environ.get("XTTS_STREAM_OVERLAP", "1024"))
+# Built-in XTTS speaker used when no speaker WAV is configured
+XTTS_DEFAULT_SPEAKER = os.environ.get("XTTS_DEFAULT_SPEAKER")
+# Speaker WAVs selectable by ID (file name without extension) and where their latents are persisted
+SPEAKER_DIR = os.environ.get("COQUI_SPEAKER_DIR", "/app/speaker_files")
+SPEAKER_LATENT_DIR = os.environ.get("COQUI_SPEAKER_LATENT_DIR", os.path.join(SPEAKER_DIR, ".latents"))
+# Synthesized-audio cache: in-memory LRU budget, optional disk tier and the longest text worth caching
+AUDIO_CACHE_MB = float(os.environ.get("TTS_AUDIO_CACHE_MB", "64"))
+AUDIO_CACHE_DIR = os.environ.get("TTS_AUDIO_CACHE_DIR", "/app/audio_cache")
+AUDIO_CACHE_DISK_MB = float(os.environ.get("TTS_AUDIO_CACHE_DISK_MB", "512"))
+AUDIO_CACHE_MAX_CHARS = int(os.environ.get("TTS_AUDIO_CACHE_MAX_CHARS", "300"))
+# Phrases synthesized into the cache at startup
+CACHE_PHRASES = os.environ.get("TTS_CACHE_PHRASES", "")
+CACHE_PHRASES_FILE = os.environ.get("TTS_CACHE_PHRASES_FILE", "")
+DEFAULT_SPEED = 2.3
+# Output sample rate when a request does not ask for one (empty: the model's native rate)
+DEFAULT_OUTPUT_SAMPLE_RATE = int(os.environ.get("TTS_OUTPUT_SAMPLE_RATE") or 0) or None
+OPUS_BITRATE = os.environ.get("TTS_OPUS_BITRATE", "24k")
+MIN_SAMPLE_RATE, MAX_SAMPLE_RATE = 8000, 48000
+# Synthesized once after the model loads so lazy kernel initialization does not hit the first request (empty: skip)
+WARMUP_TEXT = os.environ.get("TTS_WARMUP_TEXT", "Hello.")
+# Synthesis jobs running at once, and jobs allowed to wait before requests are rejected with 503
+MAX_CONCURRENCY = int(os.environ.get("TTS_MAX_CONCURRENCY", "1"))
+MAX_QUEUE = int(os.environ.get("TTS_MAX_QUEUE", "8"))
+# Cross-request batching for VITS models: sentences arriving within the window share one forward pass
+BATCHING = os.environ.get("TTS_BATCHING", "true").lower() == "true"
+BATCH_WINDOW_MS = float(os.environ.get("TTS_BATCH_WINDOW_MS", "20"))
+BATCH_MAX_SIZE = int(os.environ.get("TTS_BATCH_MAX_SIZE", "8"))
+# CPU profile, applied when the models run on the CPU: torch threads (default: the container's CPU quota),
+# int8 dynamic quantization, optional torch.compile of the waveform generator and a quantized-vs-fp32 check
+CPU_THREADS = int(os.environ.get("TTS_CPU_THREADS") or 0) or None
+CPU_INTEROP_THREADS = int(os.environ.get("TTS_CPU_INTEROP_THREADS") or 0) or None
+CPU_QUANTIZE = os.environ.get("TTS_CPU_QUANTIZE", "true").lower() == "true"
+CPU_COMPILE = os.environ.get("TTS_CPU_COMPILE", "false").lower() == "true"
+CPU_QUALITY_CHECK = os.environ.get("TTS_CPU_QUALITY_CHECK", "false").lower() == "true"
+CPU_QUALITY_MAX_LSD_DB = float(os.environ.get("TTS_CPU_QUALITY_MAX_LSD_DB", "8"))
 
 # --- Model Loading ---
-tts_instance = None
+RUNS_ON_CPU = not (USE_CUDA and torch.cuda.is_available())
+cpu_profile_info = {"enabled": RUNS_ON_CPU}
+if RUNS_ON_CPU:
+    # Before any inference, the inter-op pool can only be sized once
+    intra_op, inter_op = cpu_profile.configure_threads(CPU_THREADS, CPU_INTEROP_THREADS)
+    cpu_profile_info.update(
+        intra_op_threads=intra_op, inter_op_threads=inter_op, quantize=CPU_QUANTIZE, compile=CPU_COMPILE, models={}
+    )
+rtf_tracker = cpu_profile.RtfTracker()
+speaker_latents = SpeakerLatentCache(SPEAKER_DIR, SPEAKER_LATENT_DIR or None)
+audio_cache = AudioCache(AUDIO_CACHE_MB * 2**20, AUDIO_CACHE_DIR or None, AUDIO_CACHE_DISK_MB * 2**20)
 
-def load_model():
-    global tts_instance
-    logger.info(f"Loading Coqui TTS model: {MODEL_NAME}")
+def load_model(model_name):
+    logger.info(f"Loading Coqui TTS model: {model_name}")
     logger.info(f"Using CUDA: {USE_CUDA}")
 
     # Diagnostic import
@@ -67,153 +152,565 @@ def load_model():
 
 
     try:
-        tts_instance = TTS(MODEL_NAME, gpu=USE_CUDA)
-        if "xtts" in MODEL_NAME.lower() and SPEAKER_WAV_PATH:
+        TTS = import_tts()
+        tts = TTS(model_name, gpu=USE_CUDA)
+        if "xtts" in model_name.lower() and SPEAKER_WAV_PATH:
              if not os.path.exists(SPEAKER_WAV_PATH):
                  logger.warning(f"Speaker WAV path specified but not found: {SPEAKER_WAV_PATH}. XTTS will use default voice.")
              else:
                  logger.info(f"XTTS model detected. Speaker WAV will be used: {SPEAKER_WAV_PATH}")
-        elif "xtts" in MODEL_NAME.lower():
+                 # Compute (or load) the conditioning latents now instead of on the first request
+                 try:
+                     speaker_latents.get(xtts_streaming.get_xtts_model(tts), model_name, SPEAKER_WAV_PATH)
+                 except Exception as e:
+                     logger.warning(f"Could not precompute speaker latents for {SPEAKER_WAV_PATH}: {e}")
+        elif "xtts" in model_name.lower():
              logger.info("XTTS model detected, but no speaker WAV specified. Using default voice.")
+        if RUNS_ON_CPU:
+            apply_cpu_profile(model_name, tts)
         logger.info("Coqui TTS model loaded successfully.")
+        return tts
     except Exception as e:
         logger.error(f"Error loading Coqui TTS model: {e}", exc_info=True)
         # Depending on the error, you might want to exit or handle differently
         raise RuntimeError(f"Failed to load TTS model: {e}")
 
-# Load model on startup
-# Wrap in try-except to allow container to start even if model loading fails initially
-try:
-    load_model()
-except RuntimeError as e:
-    logger.error(f"Model loading failed on startup: {e}")
-    # Keep tts_instance as None
+def reference_synthesizer(tts):
+    """Plain per-sentence synthesis with the default voice, used by the quantization check."""
+    if xtts_streaming.is_xtts(tts):
+        xtts_model = xtts_streaming.get_xtts_model(tts)
+        conditioning = xtts_streaming.builtin_conditioning(xtts_model, XTTS_DEFAULT_SPEAKER)
+        return lambda text: xtts_streaming.synthesize_sentence(xtts_model, text, LANGUAGE, conditioning)
+    speaker = tts.speakers[0] if tts.is_multi_speaker else None
+    return lambda text: tts.tts(text=text, speaker=speaker, split_sentences=False)
+
+def apply_cpu_profile(model_name, tts):
+    """Quantizes and optionally compiles a model that runs on the CPU, checking the quantized output against fp32."""
+    info = {}
+    if CPU_QUANTIZE:
+        fp32_modules = None
+        try:
+            reference = cpu_profile.render_reference(reference_synthesizer(tts)) if CPU_QUALITY_CHECK else None
+            started = time.perf_counter()
+            info["quantized_layers"], fp32_modules = cpu_profile.quantize(tts)
+            logger.info(f"Quantized {info['quantized_layers']} layer(s) of {model_name} to int8 in {time.perf_counter() - started:.1f}s")
+            if reference:
+                # A new synthesizer, the one above holds the fp32 model
+                quantized = cpu_profile.render_reference(reference_synthesizer(tts))
+                info["quality_check"] = cpu_profile.compare(*reference, *quantized, CPU_QUALITY_MAX_LSD_DB)
+                if not info["quality_check"]["passed"]:
+                    cpu_profile.restore(tts, fp32_modules)
+                    info["quantized_layers"] = 0
+                    logger.warning(f"Keeping the fp32 weights of {model_name}: quantization failed the quality check")
+        except Exception as e:
+            # E.g. an XTTS model without a built-in speaker for the check: serve it unquantized
+            if fp32_modules is not None:
+                cpu_profile.restore(tts, fp32_modules)
+            info["quantized_layers"] = 0
+            info["quantize_error"] = str(e)
+            logger.warning(f"Quantizing {model_name} failed, keeping the fp32 weights: {e}", exc_info=True)
+        del fp32_modules
+    if CPU_COMPILE:
+        try:
+            info["compiled"] = cpu_profile.compile_generator(tts)
+        except Exception as e:
+            logger.warning(f"torch.compile failed for {model_name}, running eagerly: {e}")
+            info["compiled"] = None
+    cpu_profile_info["models"][model_name] = info
+
+def _state_bytes(value):
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        return sum(_state_bytes(v) for v in value)
+    if isinstance(value, torch.ScriptObject):
+        # Packed weights of dynamically quantized LSTMs; their pickled state holds the int8 tensors
+        try:
+            return _state_bytes(value.__getstate__())
+        except Exception:
+            return 0
+    return 0
+
+def model_memory_bytes(tts):
+    """
+    Size of the model and vocoder weights; they may live on the GPU, so count tensors instead of RSS.
+    Measured from the state dict: quantized layers keep their packed int8 weights out of parameters().
+    """
+    synthesizer = getattr(tts, "synthesizer", None)
+    total = 0
+    for module in (getattr(synthesizer, "tts_model", None), getattr(synthesizer, "vocoder_model", None)):
+        if isinstance(module, torch.nn.Module):
+            total += sum(_state_bytes(value) for value in module.state_dict().values())
+    return total
+
+# One inference pool and batch scheduler per model, created on first use and dropped on eviction
+inference_pools = {}
+batch_schedulers = {}
+_pipeline_lock = threading.Lock()
+
+def drop_pipeline(model_name):
+    """Called when a model is evicted: its pool and scheduler threads end once in-flight requests finish."""
+    with _pipeline_lock:
+        pool = inference_pools.pop(model_name, None)
+        scheduler = batch_schedulers.pop(model_name, None)
+    if pool is not None:
+        pool.close()
+    if scheduler is not None:
+        scheduler.close()
+
+# Models are loaded on first use and evicted least recently used beyond TTS_MODEL_MEMORY_MB
+model_registry = ModelRegistry(load_model, model_memory_bytes, MODELS, MODEL_MEMORY_MB * 2**20, on_evict=drop_pipeline)
+
+def use_batching(tts):
+    return BATCHING and not xtts_streaming.is_xtts(tts) and batching.supports_batching(tts)
+
+
+def get_inference_pool(model_name, tts):
+    with _pipeline_lock:
+        pool = inference_pools.get(model_name)
+        if pool is None:
+            workers = MAX_CONCURRENCY
+            # Batched models need as many workers as the batch size, or concurrent requests never meet in the batcher.
+            # The model itself still runs on the single batcher thread; the extra workers run text processing and
+            # encoding and otherwise wait for their batch.
+            if use_batching(tts):
+                workers = max(MAX_CONCURRENCY, BATCH_MAX_SIZE)
+                logger.info(f"Batching sentences of {model_name} across requests (window {BATCH_WINDOW_MS:.0f} ms, "
+                            f"up to {BATCH_MAX_SIZE} per pass); its inference pool has {workers} workers "
+                            f"instead of TTS_MAX_CONCURRENCY={MAX_CONCURRENCY}")
+            pool = inference_pools[model_name] = InferencePool(workers, MAX_QUEUE)
+        return pool
+
+def get_batch_scheduler(model_name):
+    with _pipeline_lock:
+        scheduler = batch_schedulers.get(model_name)
+        if scheduler is None:
+            # Items carry the model instance of their request, so the scheduler holds no model itself
+            scheduler = batch_schedulers[model_name] = batching.BatchScheduler(
+                batching.synthesize_items, BATCH_WINDOW_MS, BATCH_MAX_SIZE
+            )
+        return scheduler
+
+def get_output_sample_rate(tts):
+    """Sample rate of the waveforms returned by `tts.tts()`."""
+    synthesizer = getattr(tts, "synthesizer", None)
+    # XTTS reports 22050 Hz in its audio config but outputs 24 kHz
+    sample_rate = getattr(synthesizer, "output_sample_rate", None)
+    if not sample_rate and hasattr(synthesizer, "tts_config") and hasattr(synthesizer.tts_config, "audio"):
+        sample_rate = synthesizer.tts_config.audio.sample_rate
+    return int(sample_rate or 22050)
+
+def _speaker_label(speaker_id=None, path=None):
+    """Identifies a voice for the audio cache; files include their mtime so edits invalidate it."""
+    if path:
+        try:
+            return f"{os.path.realpath(path)}@{os.stat(path).st_mtime_ns}"
+        except OSError:
+            return path
+    return speaker_id or XTTS_DEFAULT_SPEAKER or "default"
+
+def audio_cache_settings(model_name, speed, speaker_id=None):
+    """
+    Everything besides the text that changes the audio, from the request and the
+    configuration alone, so a cache lookup never has to load the model.
+    """
+    settings = {"model": model_name}
+    # Same name check as load_model(); the loaded model isn't available here
+    if "xtts" in model_name.lower():
+        if speaker_id:
+            speaker = _speaker_label(speaker_id, speaker_latents.speaker_files().get(speaker_id))
+        elif SPEAKER_WAV_PATH and os.path.exists(SPEAKER_WAV_PATH):
+            speaker = _speaker_label(path=SPEAKER_WAV_PATH)
+        else:
+            speaker = _speaker_label()
+        # TTS.tts() does not pass `speed` on to XTTS, so the XTTS paths ignore it as well
+        settings.update(speaker=speaker, language=LANGUAGE)
+    else:
+        # Multi-speaker models fall back to their first speaker, single-speaker models to their only voice
+        settings.update(speaker=speaker_id or "default", speed=speed)
+    return settings
+
+def prepare_synthesis(model_name, speed, speaker_id=None, stream=None):
+    """
+    Loads the model if needed and resolves the voice and synthesis mode.
+
+    Returns `(tts, synthesize_chunks, mode)`: `synthesize_chunks(sentence)`
+    yields the float waveform of a sentence (in pieces when streaming).
+    Raises ValueError for an unknown model or an unknown or unsupported
+    `speaker_id`, and ModelLoadError if the model cannot be loaded.
+    """
+    tts = model_registry.get(model_name)
+
+    # Determine synthesis arguments (the text is passed per sentence)
+    synthesis_args = {
+        "speed": speed, # Add speed parameter
+        "split_sentences": False, # Already split, one call per sentence
+    }
+
+    is_xtts = xtts_streaming.is_xtts(tts)
+    use_streaming = is_xtts and (XTTS_STREAMING if stream is None else stream)
+    conditioning = None
+    xtts_model = None
+    if is_xtts:
+        # XTTS runs on cached speaker latents instead of re-encoding the speaker WAV per request
+        xtts_model = xtts_streaming.get_xtts_model(tts)
+        if speaker_id:
+            conditioning = speaker_latents.resolve(xtts_model, model_name, speaker_id)
+            if conditioning is None:
+                raise ValueError(f"Unknown speaker_id '{speaker_id}'.")
+        elif SPEAKER_WAV_PATH and os.path.exists(SPEAKER_WAV_PATH):
+            conditioning = speaker_latents.get(xtts_model, model_name, SPEAKER_WAV_PATH)
+        else:
+            conditioning = xtts_streaming.builtin_conditioning(xtts_model, XTTS_DEFAULT_SPEAKER)
+    elif tts.is_multi_speaker:
+        # Multi-speaker models (e.g. VCTK) need a speaker; default to the first one
+        speakers = tts.speakers
+        speaker = speaker_id or speakers[0]
+        if speaker not in speakers:
+            raise ValueError(f"Unknown speaker_id '{speaker_id}'.")
+        synthesis_args["speaker"] = speaker
+    elif speaker_id:
+        raise ValueError("speaker_id is only supported with XTTS and multi-speaker models.")
+    batched = not is_xtts and use_batching(tts)
+    batch_scheduler = get_batch_scheduler(model_name) if batched else None
+
+    def synthesize_chunks(sentence):
+        if use_streaming:
+            yield from xtts_streaming.stream_sentence(
+                xtts_model,
+                sentence,
+                LANGUAGE,
+                conditioning,
+                chunk_size=XTTS_STREAM_CHUNK_SIZE,
+                overlap=XTTS_STREAM_OVERLAP,
+            )
+        elif is_xtts:
+            yield xtts_streaming.synthesize_sentence(xtts_model, sentence, LANGUAGE, conditioning)
+        elif batched:
+            # Blocks until the batch holding this sentence has been synthesized
+            yield batch_scheduler.submit(batching.prepare_item(tts, sentence, synthesis_args.get("speaker")))
+        else:
+            yield tts.tts(text=sentence, **synthesis_args)
+
+    if use_streaming:
+        mode = f"XTTS streaming (chunk {XTTS_STREAM_CHUNK_SIZE} tokens)"
+    elif batched:
+        mode = f"batched (up to {BATCH_MAX_SIZE} sentences per pass)"
+    else:
+        mode = "per-sentence"
+    return tts, synthesize_chunks, mode
+
+def synthesize_audio(sentences, synthesize_chunks):
+    """Yields the float32 waveform of each synthesized piece of the sentences."""
+    for sentence in sentences:
+        for wav_data in synthesize_chunks(sentence):
+            samples = np.asarray(wav_data, dtype=np.float32).reshape(-1)
+            if len(samples):
+                yield samples
+
+def encode_audio(chunks, source_rate, output_format, output_rate):
+    """Resamples float chunks to `output_rate` and yields them encoded as `output_format`."""
+    resampler = StreamingResampler(source_rate, output_rate)
+    encoder = create_encoder(output_format, output_rate, OPUS_BITRATE)
+    try:
+        yield encoder.start()
+        for samples in chunks:
+            data = encoder.encode(float_to_pcm16(resampler.process(samples)))
+            if data:
+                yield data
+        yield encoder.encode(float_to_pcm16(resampler.flush())) + encoder.finish()
+    finally:
+        encoder.close()
+
+def audio_cache_key(text, cache_settings):
+    """Cache key for a text, or None if the text is too long to be worth caching."""
+    if len(text) > AUDIO_CACHE_MAX_CHARS:
+        return None
+    return make_audio_cache_key(text, **cache_settings)
+
+def load_cache_phrases():
+    """Phrases to pre-render: TTS_CACHE_PHRASES ('|'-separated) plus one per line from TTS_CACHE_PHRASES_FILE."""
+    phrases = [p for p in CACHE_PHRASES.split("|") if p.strip()]
+    if CACHE_PHRASES_FILE:
+        try:
+            with open(CACHE_PHRASES_FILE, "r", encoding="utf-8") as f:
+                phrases.extend(line for line in f.read().splitlines() if line.strip() and not line.startswith("#"))
+        except OSError as e:
+            logger.warning(f"Could not read cache phrase file {CACHE_PHRASES_FILE}: {e}")
+    return [normalize_text(p) for p in phrases]
+
+def prerender_cache_phrases():
+    """Synthesizes the configured phrases into the audio cache, skipping those already cached."""
+    phrases = load_cache_phrases()
+    if not phrases or model_registry.peek(MODEL_NAME) is None:
+        return
+    tts, synthesize_chunks, _ = prepare_synthesis(MODEL_NAME, DEFAULT_SPEED)
+    cache_settings = audio_cache_settings(MODEL_NAME, DEFAULT_SPEED)
+    sample_rate = get_output_sample_rate(tts)
+    rendered = 0
+    started = time.perf_counter()
+    for phrase in phrases:
+        key = audio_cache_key(phrase, cache_settings)
+        if key is None or audio_cache.contains(key):
+            continue
+        try:
+            chunks = synthesize_audio(split_sentences(phrase, max_chars=SENTENCE_MAX_CHARS), synthesize_chunks)
+            pcm = b"".join(float_to_pcm16(samples) for samples in chunks)
+        except Exception as e:
+            logger.error(f"Failed to pre-render phrase '{phrase[:50]}': {e}", exc_info=True)
+            continue
+        audio_cache.put(key, pcm, sample_rate)
+        rendered += 1
+    logger.info(f"Pre-rendered {rendered} of {len(phrases)} cache phrase(s) in {time.perf_counter() - started:.1f}s")
+
+def warmup():
+    """Synthesizes WARMUP_TEXT with the default model, initializing CUDA/oneDNN kernels (and compiling) ahead of the first request."""
+    _, synthesize_chunks, mode = prepare_synthesis(MODEL_NAME, DEFAULT_SPEED)
+    samples = sum(len(chunk) for chunk in synthesize_audio([WARMUP_TEXT], synthesize_chunks))
+    logger.info(f"Warmup synthesized {samples} samples ({mode})")
+
+# --- Startup ---
+# Runs in a background thread once the server is up: /health/live answers at once, /health/ready after the model loaded
+startup = {"state": "starting", "phases": {}, "error": None, "ready_after_sec": None}
+
+def run_phase(name, fn):
+    started = time.perf_counter()
+    try:
+        return fn()
+    finally:
+        startup["phases"][name] = round(time.perf_counter() - started, 3)
+        logger.info(f"Startup phase '{name}' took {startup['phases'][name]:.2f}s")
+
+def startup_sequence():
+    try:
+        run_phase("bootstrap", lambda: bootstrap.run(MODELS, SPEAKER_DIR))
+        run_phase("import", import_tts)
+        run_phase("load_model", lambda: model_registry.get(MODEL_NAME))
+    except Exception as e:
+        # Requests still try to load the model again (see ModelRegistry)
+        logger.error(f"Model loading failed on startup: {e}", exc_info=True)
+        startup.update(state="failed", error=str(e))
+        return
+
+    if WARMUP_TEXT:
+        try:
+            run_phase("warmup", warmup)
+        except Exception as e:
+            logger.warning(f"Warmup synthesis failed: {e}", exc_info=True)
+    try:
+        run_phase("prerender", prerender_cache_phrases)
+    except Exception as e:
+        logger.error(f"Pre-rendering cache phrases failed: {e}", exc_info=True)
+
+    startup.update(state="ready", ready_after_sec=round(time.perf_counter() - PROCESS_STARTED, 3))
+    logger.info(f"Coqui TTS API ready after {startup['ready_after_sec']:.1f}s ({startup['phases']})")
+
+def is_ready():
+    # A failed startup recovers once a request manages to load a model
+    return startup["state"] == "ready" or (startup["state"] == "failed" and bool(model_registry.stats()["loaded"]))
 
 # --- API Definition ---
 app = FastAPI()
 
+@app.on_event("startup")
+def start_background_startup():
+    threading.Thread(target=startup_sequence, name="tts-startup", daemon=True).start()
+
 class TTSRequest(BaseModel):
     text: str
-    speed: Optional[float] = 2.3 # Default to normal speed
+    speed: Optional[float] = DEFAULT_SPEED # Default to normal speed
+    format: Optional[str] = "wav" # "wav" (streamed header + PCM) or "pcm" (raw s16le)
+    stream: Optional[bool] = None # XTTS token-level streaming, defaults to XTTS_STREAMING
+    sample_rate: Optional[int] = None # Output rate, defaults to TTS_OUTPUT_SAMPLE_RATE or the model's rate
+    speaker_id: Optional[str] = None # XTTS speaker (WAV name in COQUI_SPEAKER_DIR or built-in) or a multi-speaker model's speaker
+    model: Optional[str] = None # One of COQUI_MODEL / COQUI_MODELS, defaults to COQUI_MODEL
     # Add other potential parameters like speaker_wav (base64?), language if needed
 
+def queue_full_error(error, pool):
+    logger.warning(f"Rejecting TTS request: {error} ({pool.stats()})")
+    return HTTPException(
+        status_code=503,
+        detail="TTS service is busy, please retry later.",
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
 @app.post("/api/tts", responses={200: {"content": {"audio/wav": {}}}})
 async def synthesize_speech(request: TTSRequest):
-    if not tts_instance:
-        # Attempt to reload model if it failed on startup
-        try:
-            logger.warning("TTS model not loaded. Attempting to reload...")
-            load_model()
-            if not tts_instance: # Check again after reload attempt
-                 raise HTTPException(status_code=503, detail="TTS model is not available and failed to reload.")
-        except Exception as e:
-             logger.error(f"Failed to reload TTS model during request: {e}", exc_info=True)
-             raise HTTPException(status_code=503, detail=f"TTS model is not available and failed to reload: {e}")
-
-
+    model_name = request.model or MODEL_NAME
     text_to_synthesize = request.text
     if not text_to_synthesize:
         raise HTTPException(status_code=400, detail="Text input cannot be empty.")
 
     logger.info(f"Received TTS request for text: '{text_to_synthesize[:50]}...'")
 
+    output_format = (request.format or "wav").lower()
+    if output_format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{request.format}'. Expected one of: {', '.join(MEDIA_TYPES)}.")
+    if request.sample_rate is not None and not MIN_SAMPLE_RATE <= request.sample_rate <= MAX_SAMPLE_RATE:
+        raise HTTPException(status_code=400, detail=f"sample_rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE} Hz.")
+
+    sentences = split_sentences(text_to_synthesize, max_chars=SENTENCE_MAX_CHARS)
+    if not sentences:
+        raise HTTPException(status_code=400, detail="Text input cannot be empty.")
+
     try:
-        # Determine synthesis arguments
-        synthesis_args = {
-            "text": text_to_synthesize,
-            "speed": request.speed, # Add speed parameter
-        }
-        if "xtts" in MODEL_NAME.lower():
-            synthesis_args["language"] = LANGUAGE
-            if SPEAKER_WAV_PATH and os.path.exists(SPEAKER_WAV_PATH):
-                synthesis_args["speaker_wav"] = SPEAKER_WAV_PATH
-
-        logger.info(f"Attempting TTS with args: {synthesis_args}")
-        
-        # Define an async generator to stream the audio chunks
-        async def generate_audio_stream():
-            import numpy as np
-            import wave
-            import struct
-            import io
-            
-            # Define a default sample rate that will be used if we can't determine it from the model
-            sample_rate = 22050  # Default sample rate
-            
+        # The cache holds PCM at the model's rate, so one entry serves every format and rate
+        cache_key = audio_cache_key(
+            normalize_text(text_to_synthesize), audio_cache_settings(model_name, request.speed, request.speaker_id)
+        )
+
+        def render_cached():
+            cached = audio_cache.get(cache_key) if cache_key else None
+            if cached is None:
+                return None
+            pcm, cached_rate = cached
+            output_rate = request.sample_rate or DEFAULT_OUTPUT_SAMPLE_RATE or cached_rate
+            body = b"".join(encode_audio([pcm16_to_float32(pcm)], cached_rate, output_format, output_rate))
+            if output_format == "wav":
+                # The complete length is known, so write a regular header
+                body = wav_header(output_rate, data_size=len(body) - 44) + body[44:]
+            return body, output_rate
+
+        # Served from the audio cache before the model is looked up, so a hit never loads it
+        # (and never waits in the inference queue)
+        cached = await run_in_threadpool(render_cached)
+        if cached is not None:
+            body, output_rate = cached
+            logger.info(f"Audio cache hit ({len(body)} bytes {output_format} at {output_rate} Hz)")
+            headers = {"X-Content-Type-Options": "nosniff", "X-Sample-Rate": str(output_rate), "X-Cache": "hit"}
+            return Response(content=body, media_type=media_type(output_format, output_rate), headers=headers)
+
+        try:
+            # Off the event loop: may have to load the model or encode a new speaker WAV (once each)
+            tts, synthesize_chunks, mode = await run_in_threadpool(
+                prepare_synthesis, model_name, request.speed, request.speaker_id, request.stream
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ModelLoadError as e:
+            raise HTTPException(status_code=503, detail=f"TTS model is not available: {e}")
+
+        sample_rate = get_output_sample_rate(tts)
+        output_rate = request.sample_rate or DEFAULT_OUTPUT_SAMPLE_RATE or sample_rate
+        headers = {"X-Content-Type-Options": "nosniff", "X-Sample-Rate": str(output_rate)}
+
+        logger.info(f"Synthesizing {len(sentences)} sentence(s) with {model_name} at {sample_rate} Hz, {mode}, as {output_format} at {output_rate} Hz")
+
+        # Stream the header first, then every sentence as soon as it is synthesized.
+        # Runs on an inference worker; the items are handed to the event loop as they are produced.
+        def generate_audio_stream():
+            started = time.perf_counter()
+            audio_samples = 0
+            collected = [] if cache_key else None
+
+            def synthesized():
+                nonlocal audio_samples
+                for samples in synthesize_audio(sentences, synthesize_chunks):
+                    if audio_samples == 0:
+                        logger.info(f"First audio after {time.perf_counter() - started:.2f}s")
+                    audio_samples += len(samples)
+                    if collected is not None:
+                        collected.append(float_to_pcm16(samples))
+                    yield samples
+
             try:
-                # Process the TTS in chunks
-                wav_data = tts_instance.tts(**synthesis_args)
-                logger.info(f"Generated audio data, converting to WAV format")
-                
-                # Create a complete WAV file first
-                wav_buffer = io.BytesIO()
-                
-                # Handle the audio output based on what the TTS returns
-                if hasattr(tts_instance, 'synthesizer') and hasattr(tts_instance.synthesizer, 'ap'):
-                    # Get the sample rate from the model config if available
-                    if hasattr(tts_instance.synthesizer, 'tts_config') and hasattr(tts_instance.synthesizer.tts_config, 'audio'):
-                        sample_rate = tts_instance.synthesizer.tts_config.audio.sample_rate
-                    
-                    # Create a WAV file in memory
-                    tts_instance.synthesizer.ap.save_wav(wav_data, wav_buffer, sample_rate)
-                else:
-                    # Fallback approach for different model types
-                    # Convert to numpy array if not already
-                    if not isinstance(wav_data, np.ndarray):
-                        wav_data = np.array(wav_data)
-                    
-                    # Normalize if needed
-                    if wav_data.max() > 1.0 or wav_data.min() < -1.0:
-                        wav_data = wav_data / np.max(np.abs(wav_data))
-                    
-                    # Convert to int16
-                    wav_data = (wav_data * 32767).astype(np.int16)
-                    
-                    # Create a WAV file in memory
-                    with wave.open(wav_buffer, 'wb') as wf:
-                        wf.setnchannels(1)  # Mono
-                        wf.setsampwidth(2)  # 16-bit
-                        wf.setframerate(sample_rate)  # Sample rate is now always defined
-                        wf.writeframes(struct.pack('<' + 'h' * len(wav_data), *wav_data))
-                
-                # Get the full WAV data
-                wav_buffer.seek(0)
-                wav_bytes = wav_buffer.read()
-                
-                # Yield as one chunk
-                logger.info(f"Streaming WAV data ({len(wav_bytes)} bytes)")
-                yield wav_bytes
-            
+                for data in encode_audio(synthesized(), sample_rate, output_format, output_rate):
+                    yield data
             except Exception as e:
                 logger.error(f"Error during TTS generation: {e}", exc_info=True)
-                # We can't raise an HTTP exception inside the generator
-                # The best we can do is log it and return an empty response
-                yield b''
-        
+                # The response has already started, so the stream just ends here
+                return
+
+            if collected:
+                audio_cache.put(cache_key, b"".join(collected), sample_rate)
+            elapsed = time.perf_counter() - started
+            audio_sec = audio_samples / sample_rate
+            rtf = elapsed / audio_sec if audio_sec else 0.0
+            rtf_tracker.record(model_name, elapsed, audio_sec)
+            logger.info(f"Streamed {audio_sec:.2f}s of audio in {elapsed:.2f}s (RTF {rtf:.2f})")
+
+        inference_pool = get_inference_pool(model_name, tts)
+        try:
+            audio_stream = inference_pool.stream(generate_audio_stream)
+        except QueueFull as e:
+            raise queue_full_error(e, inference_pool)
+
         # Return a streaming response with the audio chunks
         return StreamingResponse(
-            generate_audio_stream(),
-            media_type="audio/wav",
-            headers={"X-Content-Type-Options": "nosniff"}
+            audio_stream,
+            media_type=media_type(output_format, output_rate),
+            headers={**headers, "X-Cache": "miss"}
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during TTS synthesis: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"TTS synthesis failed: {e}")
 
+@app.get("/api/speakers")
+async def list_speakers(model: Optional[str] = None):
+    """Speaker IDs usable as `speaker_id`: WAV files in the speaker directory and the model's built-in speakers."""
+    try:
+        tts = await run_in_threadpool(model_registry.get, model or MODEL_NAME)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelLoadError as e:
+        raise HTTPException(status_code=503, detail=f"TTS model is not available: {e}")
+    builtin = []
+    if xtts_streaming.is_xtts(tts):
+        manager = getattr(xtts_streaming.get_xtts_model(tts), "speaker_manager", None)
+        builtin = sorted(getattr(manager, "speakers", None) or {})
+    elif tts.is_multi_speaker:
+        builtin = list(tts.speakers)
+    return {"files": sorted(speaker_latents.speaker_files()), "builtin": builtin}
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving; says nothing about the model."""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def readiness():
+    """200 once the default model is loaded and warmed up, 503 while starting or after a failed start."""
+    ready = is_ready()
+    body = {"status": "ready" if ready else startup["state"], "phases": startup["phases"], "error": startup["error"]}
+    return JSONResponse(content=body, status_code=200 if ready else 503)
+
 @app.get("/health")
 async def health_check():
     # Basic health check
-    model_loaded_status = tts_instance is not None
-    status = "ok" if model_loaded_status else "error"
-    detail = "" if model_loaded_status else "TTS model may not be loaded correctly."
+    models = model_registry.stats()
+    model_loaded_status = bool(models["loaded"])
+    if model_loaded_status:
+        status, detail = "ok", ""
+    elif startup["state"] == "starting":
+        status, detail = "starting", "TTS model is loading."
+    else:
+        status, detail = "error", "TTS model may not be loaded correctly."
 
-    return {"status": status, "model_loaded": model_loaded_status, "model_name": MODEL_NAME, "detail": detail}
+    with _pipeline_lock:
+        pools = dict(inference_pools)
+        schedulers = dict(batch_schedulers)
+    return {
+        "status": status,
+        "model_loaded": model_loaded_status,
+        "model_name": MODEL_NAME,
+        "startup": startup,
+        "models": models,
+        "speaker_cache": speaker_latents.stats(),
+        "audio_cache": audio_cache.stats(),
+        "inference": {name: pool.stats() for name, pool in pools.items()},
+        "batching": {name: scheduler.stats() for name, scheduler in schedulers.items()},
+        "rtf": rtf_tracker.stats(),
+        "cpu_profile": cpu_profile_info,
+        "detail": detail,
+    }
 
 if __name__ == "__main__":
     import uvicorn
     # Running with uvicorn directly might be useful for debugging
     # Production deployment should use the command in the Dockerfile
-    # Note: Model loading happens before uvicorn starts if run this way
+    # The model loads in the background once the server is up (see startup_sequence)
     uvicorn.run(app, host="0.0.0.0", port=5002)
 
@@ -0,0 +1,175 @@
+"""
+Synthesized-audio cache for the Coqui TTS API.
+
+Confirmations, timer announcements and the backend's fallback strings are
+repeated word for word, so their audio is cached instead of re-synthesized.
+Entries are keyed by a BLAKE2 hash of the normalized text and every setting
+that changes the audio (model, speaker, language, speed). The 16-bit PCM is
+kept in an in-memory LRU bounded by bytes, and optionally in a size-capped
+disk tier of WAV files (written atomically) that survives restarts.
+
+The LRU and the disk tier mirror `TranscriptionCache` in
+whisper-api/result_cache.py (the services are separate images); fixes to
+either belong in both.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import wave
+from collections import OrderedDict
+
+from audio_encoding import wav_header
+from text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(text, **settings):
+    """Hashes the normalized text and the synthesis settings into a cache key."""
+    digest = hashlib.blake2b(digest_size=20)
+    # Both XTTS and the English cleaners lower-case the text before synthesis
+    digest.update(normalize_text(text).lower().encode("utf-8"))
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AudioCache:
+    """LRU of `(pcm_bytes, sample_rate)` under a byte budget, with an optional disk tier."""
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self._max_bytes = int(max_bytes)
+        self._entries = OrderedDict()  # key -> (pcm, sample_rate)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_dir = disk_dir or None
+        self._disk_max_bytes = int(disk_max_bytes)
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self._disk_dir:
+            try:
+                os.makedirs(self._disk_dir, exist_ok=True)
+                self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self._disk_dir) if entry.name.endswith(".wav"))
+            except OSError as e:
+                logger.warning(f"Audio cache disk tier disabled, {self._disk_dir} is not usable: {e}")
+                self._disk_dir = None
+
+    def get(self, key):
+        """Returns `(pcm, sample_rate)` or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        self._insert(key, entry)
+        return entry
+
+    def contains(self, key):
+        """True if the key is cached in memory or on disk, without counting a lookup."""
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self._disk_dir) and os.path.exists(self._path(key))
+
+    def put(self, key, pcm, sample_rate):
+        entry = (bytes(pcm), int(sample_rate))
+        self._insert(key, entry)
+        if self._disk_dir:
+            self._write_disk(key, entry)
+
+    def _insert(self, key, entry):
+        size = len(entry[0])
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self._max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self._disk_dir, f"{key}.wav")
+
+    def _read_disk(self, key):
+        if not self._disk_dir:
+            return None
+        try:
+            with wave.open(self._path(key), "rb") as wf:
+                return wf.readframes(wf.getnframes()), wf.getframerate()
+        except (OSError, EOFError, wave.Error):
+            return None
+
+    def _write_disk(self, key, entry):
+        pcm, sample_rate = entry
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        data = wav_header(sample_rate, data_size=len(pcm)) + pcm
+        try:
+            # An existing entry (concurrent identical misses, or rendered before a restart) is replaced, not added
+            try:
+                replaced_size = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced_size = 0
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write audio cache entry {path}: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += len(data) - replaced_size
+            over_budget = self._disk_max_bytes and self._disk_bytes > self._disk_max_bytes
+        if over_budget:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Removes the oldest files until the disk tier is back under 90% of its budget."""
+        entries = []
+        for entry in os.scandir(self._disk_dir):
+            if entry.name.endswith(".wav"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = self._disk_max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "disk_bytes": self._disk_bytes if self._disk_dir else None,
+            }
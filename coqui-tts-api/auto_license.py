@@ -1,113 +0,0 @@
-#!/usr/bin/env python3
-"""
-Automatic Coqui TTS License Acceptor
-
-This script:
-1. Creates license acceptance files in all necessary locations
-2. Directly manipulates the Coqui TTS model storage to bypass license prompts
-3. Pre-downloads the model files without interactive prompts
-4. Sets the environment to avoid future license checks
-"""
-import os
-import sys
-import yaml
-import logging
-import json
-import requests
-import subprocess
-from pathlib import Path
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger("auto_license")
-
-# Configuration
-MODEL_NAME = os.environ.get("COQUI_MODEL", "tts_models/multilingual/multi-dataset/xtts_v2")
-LICENSE_AGREED = True
-HOME_DIR = os.path.expanduser("~")
-
-def create_license_files():
-    """Create license acceptance files in all possible locations"""
-    license_paths = [
-        os.path.join(HOME_DIR, ".local", "share", "tts", ".models.yaml"),
-        os.path.join("/app", ".models.yaml"),
-        os.path.join("/root/.local/share/tts/.models.yaml"),
-        os.path.join(".models.yaml")  # Current directory
-    ]
-    
-    yaml_content = f"""models:
-  {MODEL_NAME}:
-    license_accepted: true
-"""
-    
-    for path in license_paths:
-        try:
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            with open(path, 'w') as f:
-                f.write(yaml_content)
-            logger.info(f"Created license file at: {path}")
-        except Exception as e:
-            logger.warning(f"Failed to create license file at {path}: {e}")
-
-def direct_download_model():
-    """Download the model files directly from the source without using TTS library"""
-    try:
-        # Derive model directory path from model name
-        model_parts = MODEL_NAME.split('/')
-        model_dir_name = "--".join(model_parts)
-        model_dir = os.path.join(HOME_DIR, ".local", "share", "tts", model_dir_name)
-        os.makedirs(model_dir, exist_ok=True)
-
-        # Add license acceptance file directly in the model directory
-        license_path = os.path.join(model_dir, ".models.yaml")
-        yaml_content = f"""models:
-  {MODEL_NAME}:
-    license_accepted: true
-"""
-        with open(license_path, 'w') as f:
-            f.write(yaml_content)
-        logger.info(f"Created license file in model directory: {license_path}")
-
-        # Create a dummy config.json to mark the model as already downloaded
-        config_path = os.path.join(model_dir, "config.json")
-        if not os.path.exists(config_path):
-            dummy_config = {"license_accepted": True}
-            with open(config_path, 'w') as f:
-                json.dump(dummy_config, f)
-            logger.info(f"Created dummy config file: {config_path}")
-
-        logger.info("Model directory prepared for license-free loading")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to prepare model directory: {e}")
-        return False
-
-def patch_environment():
-    """Patch the environment to avoid license checks"""
-    os.environ["COQUI_TTS_AGREED_TO_TERMS"] = "1"
-    os.environ["ACCEPT_LICENSE"] = "y"
-    logger.info("Environment patched to accept licenses")
-
-def main():
-    """Main function to accept the license"""
-    logger.info(f"Starting automatic license acceptance for {MODEL_NAME}")
-    
-    # Create license files
-    create_license_files()
-    
-    # Patch environment
-    patch_environment()
-    
-    # Direct download approach
-    if direct_download_model():
-        logger.info("Model prepared for license-free loading")
-    else:
-        logger.warning("Failed to fully prepare model, but license files were created")
-    
-    logger.info("License acceptance complete. The model should now load without prompts.")
-
-if __name__ == "__main__":
-    main()
@@ -0,0 +1,224 @@
+"""
+Cross-request batched synthesis for the Coqui TTS API.
+
+VITS is non-autoregressive: text encoder, duration predictor, flow and
+HiFi-GAN decoder all run over the whole (padded) sequence at once, so
+sentences from concurrent requests can share one forward pass. Sentences that
+arrive within `window_ms` of the first queued one are collected, up to
+`max_batch_size`, padded into a single batch with `x_lengths`, and the
+waveforms are cut back out using the output mask. Each waveform then gets
+the same post-processing as `Synthesizer.tts()` (silence trimming and the
+trailing pause), so a sentence sounds the same batched or not and one audio
+cache entry fits both. Every item carries the model instance of the request
+that queued it, so a batch never has to look the model up (and reload it
+after an eviction); items of different instances run as separate passes.
+
+Tacotron2 decodes frame by frame until its stop token fires for a single
+sequence, so it is not batched and keeps using `TTS.tts()`.
+
+The scheduler is one worker thread per model that collects sentences for
+`window_ms`, runs the batch and wakes the waiting requests. It ends when its
+model is evicted (`close()`) and keeps only the counters `/health` reports.
+"""
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Synthesizer.tts() appends this many zero samples after every sentence
+SENTENCE_PAUSE_SAMPLES = 10000
+
+_STOP = object()
+
+
+class _Job:
+    __slots__ = ("item", "done", "result", "error", "enqueued_at")
+
+    def __init__(self, item):
+        self.item = item
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.enqueued_at = time.monotonic()
+
+
+class BatchScheduler:
+    """Collects concurrent items into batches for a single worker thread."""
+
+    def __init__(self, batch_fn, window_ms=20, max_batch_size=8):
+        self._batch_fn = batch_fn
+        self._window = window_ms / 1000.0
+        self._max_batch_size = max(1, int(max_batch_size))
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+        # Stats
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+        self._total_wait = 0.0
+
+    def submit(self, item):
+        """Queues an item and blocks until its batch has been processed."""
+        job = _Job(item)
+        # Queued before the worker check, so a worker that is just stopping sees it
+        self._queue.put(job)
+        self._ensure_worker()
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "max_observed_batch_size": self._max_seen,
+                "avg_queue_wait_ms": round(self._total_wait / self._items * 1000.0, 2) if self._items else 0.0,
+            }
+
+    def close(self):
+        """Stops the worker thread once the queue is empty; a later submit() starts a new one."""
+        self._queue.put(_STOP)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="tts-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self._window
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is _STOP:
+                self._queue.put(_STOP)  # Handled after this batch
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                with self._lock:
+                    if self._queue.empty():
+                        self._worker = None
+                        return
+                continue
+            started = time.monotonic()
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._max_seen = max(self._max_seen, len(batch))
+                self._total_wait += sum(started - job.enqueued_at for job in batch)
+
+            try:
+                results = self._batch_fn([job.item for job in batch])
+                for job, result in zip(batch, results):
+                    job.result = result
+            except Exception as e:
+                logger.error(f"Batched synthesis of {len(batch)} item(s) failed: {e}", exc_info=True)
+                for job in batch:
+                    job.error = e
+            finally:
+                for job in batch:
+                    job.done.set()
+
+
+def supports_batching(tts):
+    """True for end-to-end VITS models whose inputs can be padded into one batch."""
+    synthesizer = getattr(tts, "synthesizer", None)
+    model = getattr(synthesizer, "tts_model", None)
+    if model is None or type(model).__name__ != "Vits" or getattr(synthesizer, "vocoder_model", None) is not None:
+        return False
+    if getattr(model.config, "use_d_vector_file", False):
+        return False  # Speakers given as d-vectors (e.g. YourTTS)
+    language_manager = getattr(model, "language_manager", None)
+    return language_manager is None or len(language_manager.name_to_id) <= 1
+
+
+def prepare_item(tts, text, speaker_name=None):
+    """Tokenizes a sentence into a batch item `(tts, token_ids, speaker_index)`."""
+    model = tts.synthesizer.tts_model
+    speaker_index = None
+    if speaker_name is not None:
+        speaker_index = model.speaker_manager.name_to_id[speaker_name]
+    return tts, model.tokenizer.text_to_ids(text), speaker_index
+
+
+def synthesize_items(items):
+    """Batch function for the scheduler: one padded pass per model instance among the items."""
+    results = [None] * len(items)
+    groups = {}
+    for index, (tts, _, _) in enumerate(items):
+        groups.setdefault(id(tts), (tts, []))[1].append(index)
+    for tts, indices in groups.values():
+        waveforms = synthesize_batch(tts, [items[i][1:] for i in indices])
+        for index, wav in zip(indices, waveforms):
+            results[index] = wav
+    return results
+
+
+def synthesize_batch(tts, items):
+    """
+    Runs one padded VITS forward pass for `(token_ids, speaker_index)` items;
+    returns float32 waveforms post-processed like `Synthesizer.tts()`.
+    """
+    import torch
+    from TTS.tts.utils.synthesis import trim_silence
+
+    model = tts.synthesizer.tts_model
+    device = next(model.parameters()).device
+    lengths = [len(token_ids) for token_ids, _ in items]
+    x = torch.zeros(len(items), max(lengths), dtype=torch.long)
+    for row, (token_ids, _) in enumerate(items):
+        x[row, :len(token_ids)] = torch.as_tensor(token_ids, dtype=torch.long)
+
+    speaker_ids = None
+    if items[0][1] is not None:
+        speaker_ids = torch.as_tensor([speaker_index for _, speaker_index in items], dtype=torch.long, device=device)
+
+    with torch.no_grad():
+        outputs = model.inference(
+            x.to(device),
+            aux_input={
+                "x_lengths": torch.as_tensor(lengths, dtype=torch.long, device=device),
+                "speaker_ids": speaker_ids,
+                "d_vectors": None,
+                "language_ids": None,
+                "durations": None,
+            },
+        )
+
+    waveforms = outputs["model_outputs"][:, 0].float().cpu().numpy()  # [B, T_wav]
+    y_mask = outputs["y_mask"][:, 0]  # [B, T_dec]
+    samples_per_frame = waveforms.shape[1] // y_mask.shape[1]
+    frames = y_mask.sum(dim=1).long().cpu().tolist()
+
+    audio_config = tts.synthesizer.tts_config.audio
+    trim = "do_trim_silence" in audio_config and audio_config["do_trim_silence"]
+    results = []
+    for row, frame_count in enumerate(frames):
+        wav = waveforms[row, :frame_count * samples_per_frame]
+        if trim:
+            wav = trim_silence(wav, model.ap)
+        results.append(np.concatenate([wav, np.zeros(SENTENCE_PAUSE_SAMPLES, dtype=np.float32)]))
+    return results
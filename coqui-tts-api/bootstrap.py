@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Startup preparation for the Coqui TTS API.
+
+Replaces prestart.py, auto_license.py, tts_wrapper.py and patch_tts.py.
+TTS 0.22 decides whether a model's license was accepted by looking for
+`tos_agreed.txt` in the model directory or `COQUI_TOS_AGREED=1`; the
+`.models.yaml` files and source patches those scripts wrote were never read.
+So the license step sets the variable and writes `tos_agreed.txt` into the
+directory of every configured model that has been downloaded. It is
+idempotent: a stamp file in the TTS data directory records the models, the
+downloaded ones and the TTS version it was done for, and later starts skip it
+until one of them changes.
+
+MP3 speaker references are converted to WAV on every start (formerly
+convert_mp3.py); files whose WAV is newer than the MP3 are skipped.
+
+Called by the app's background loader; can also be run on its own.
+"""
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+logger = logging.getLogger("bootstrap")
+
+BOOTSTRAP_VERSION = 1
+STAMP_FILE = ".bootstrap-stamp.json"
+TOS_TEXT = "I have read, understood and agreed to the Terms and Conditions."
+
+
+def tts_data_dir():
+    """Where TTS stores downloaded models (same lookup as TTS.utils.generic_utils.get_user_data_dir)."""
+    if os.environ.get("TTS_HOME"):
+        base = Path(os.environ["TTS_HOME"]).expanduser()
+    elif os.environ.get("XDG_DATA_HOME"):
+        base = Path(os.environ["XDG_DATA_HOME"]).expanduser()
+    else:
+        base = Path.home() / ".local" / "share"
+    return base / "tts"
+
+
+def _tts_version():
+    try:
+        from importlib.metadata import version
+
+        return version("TTS")
+    except Exception:
+        return None
+
+
+def _read_stamp(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _downloaded_models(model_names, data_dir):
+    """Configured hub models whose directory exists (local model paths have no license prompt)."""
+    return sorted(
+        name for name in set(model_names)
+        if not os.path.isabs(name) and name.count("/") == 3 and (data_dir / name.replace("/", "--")).is_dir()
+    )
+
+
+def accept_licenses(model_names, data_dir):
+    """Marks the terms of service as accepted, as `TTS` itself does after a "y" answer."""
+    os.environ["COQUI_TOS_AGREED"] = "1"
+    # TTS treats an existing directory as a downloaded model, so only existing ones get the file;
+    # COQUI_TOS_AGREED covers the first download
+    for model_name in _downloaded_models(model_names, data_dir):
+        model_dir = data_dir / model_name.replace("/", "--")
+        tos_path = model_dir / "tos_agreed.txt"
+        if not tos_path.exists():
+            tos_path.write_text(TOS_TEXT, encoding="utf-8")
+            logger.info(f"Accepted license for {model_name}")
+
+
+def convert_speaker_mp3s(speaker_dir):
+    """Converts MP3 speaker references to WAV for XTTS voice cloning; returns the number converted."""
+    speaker_dir = Path(speaker_dir)
+    mp3_files = sorted(speaker_dir.glob("*.mp3")) if speaker_dir.is_dir() else []
+    pending = [
+        mp3 for mp3 in mp3_files
+        if not mp3.with_suffix(".wav").exists() or mp3.with_suffix(".wav").stat().st_mtime <= mp3.stat().st_mtime
+    ]
+    if not pending:
+        return 0
+    try:
+        from pydub import AudioSegment
+    except ImportError:
+        logger.error("pydub not installed. Cannot convert MP3 files.")
+        return 0
+
+    converted = 0
+    for mp3 in pending:
+        try:
+            AudioSegment.from_mp3(mp3).export(mp3.with_suffix(".wav"), format="wav")
+            logger.info(f"Converted {mp3.name} to {mp3.with_suffix('.wav').name}")
+            converted += 1
+        except Exception as e:
+            logger.error(f"Error converting {mp3.name}: {e}")
+    return converted
+
+
+def run(model_names, speaker_dir):
+    """Runs the bootstrap; returns a summary of what was done."""
+    started = time.perf_counter()
+    data_dir = tts_data_dir()
+    stamp_path = data_dir / STAMP_FILE
+    stamp = {
+        "version": BOOTSTRAP_VERSION,
+        "models": sorted(set(model_names)),
+        "downloaded": _downloaded_models(model_names, data_dir),
+        "tts": _tts_version(),
+    }
+
+    licenses_done = _read_stamp(stamp_path) == stamp
+    if licenses_done:
+        os.environ["COQUI_TOS_AGREED"] = "1"
+    else:
+        accept_licenses(model_names, data_dir)
+        try:
+            data_dir.mkdir(parents=True, exist_ok=True)
+            with open(stamp_path, "w", encoding="utf-8") as f:
+                json.dump(stamp, f)
+        except OSError as e:
+            logger.warning(f"Could not write bootstrap stamp {stamp_path}: {e}")
+
+    converted = convert_speaker_mp3s(speaker_dir)
+    summary = {
+        "licenses": "cached" if licenses_done else "accepted",
+        "converted_mp3": converted,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Bootstrap finished: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    models = [os.environ.get("COQUI_MODEL", "tts_models/en/ljspeech/tacotron2-DDC")]
+    models += [name.strip() for name in os.environ.get("COQUI_MODELS", "").split(",") if name.strip()]
+    run(models, os.environ.get("COQUI_SPEAKER_DIR", "/app/speaker_files"))
+    sys.exit(0)
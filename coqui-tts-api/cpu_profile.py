@@ -0,0 +1,217 @@
+"""
+CPU inference profile for the Coqui TTS API.
+
+On nodes without a GPU the stock fp32 graph runs with PyTorch's default
+threading, which ignores the container's CPU quota. The CPU profile:
+
+    threads   intra-op threads sized to the cgroup CPU quota (not the host's
+              core count, which oversubscribes a limited container), one
+              inter-op thread since synthesis is a chain of dependent ops
+    quantize  dynamic int8 quantization of the Linear and LSTM layers
+              (weights stored as int8, activations quantized on the fly)
+    compile   optionally `torch.compile` of the waveform generator. The
+              generator's input length depends on predicted durations, so it
+              is compiled with dynamic shapes; tracing would freeze them.
+
+The quality check renders a fixed sentence set with the same random seed
+before and after quantization (`render_reference()`) and reports the
+log-spectral distance and duration drift (`compare()`). `quantize()` swaps in
+quantized copies and returns the fp32 modules, which `restore()` puts back if
+the check (or quantization itself) fails. `RtfTracker` keeps a
+rolling real-time factor per model for `/health`.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUALITY_SENTENCES = (
+    "The timer is set for ten minutes.",
+    "It is currently twenty-one degrees and partly cloudy outside.",
+    "I turned off the lights in the living room.",
+    "Sorry, I didn't catch that. Could you say it again?",
+)
+
+
+def available_cpus():
+    """
+    CPU count honouring the container's cgroup CPU quota. Kept in step with
+    `_available_cpus` in whisper-api/gunicorn.conf.py; the two services are
+    separate images and share no package.
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:  # cgroup v2
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:  # cgroup v1
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, int(quota / period))
+    except (OSError, ValueError):
+        pass
+    return len(os.sched_getaffinity(0))
+
+
+def configure_threads(intra_op=None, inter_op=None):
+    """Sets torch's thread pools; must run before the first inference. Returns `(intra_op, inter_op)`."""
+    import torch
+
+    intra_op = intra_op or available_cpus()
+    inter_op = inter_op or 1
+    torch.set_num_threads(intra_op)
+    try:
+        torch.set_num_interop_threads(inter_op)
+    except RuntimeError as e:
+        # Only possible before any inter-op parallel work has started
+        logger.warning(f"Could not set inter-op threads: {e}")
+        inter_op = torch.get_num_interop_threads()
+    logger.info(f"Torch CPU threads: {intra_op} intra-op, {inter_op} inter-op")
+    return intra_op, inter_op
+
+
+_MODEL_ATTRS = ("tts_model", "vocoder_model")
+
+
+def _model_modules(tts):
+    synthesizer = getattr(tts, "synthesizer", None)
+    return [m for m in (getattr(synthesizer, attr, None) for attr in _MODEL_ATTRS) if m is not None]
+
+
+def quantize(tts):
+    """
+    Replaces the model and vocoder with copies whose Linear and LSTM layers use
+    dynamic int8 quantization. Nothing is replaced unless all of them quantize.
+    Returns `(layers, fp32_modules)`; the fp32 modules are for `restore()`.
+    """
+    import torch
+
+    layer_types = (torch.nn.Linear, torch.nn.LSTM)
+    synthesizer = tts.synthesizer
+    originals = {attr: getattr(synthesizer, attr) for attr in _MODEL_ATTRS if getattr(synthesizer, attr, None) is not None}
+    quantized = {}
+    count = 0
+    for attr, module in originals.items():
+        count += sum(isinstance(m, layer_types) for m in module.modules())
+        quantized[attr] = torch.quantization.quantize_dynamic(module, set(layer_types), dtype=torch.qint8)
+    for attr, module in quantized.items():
+        setattr(synthesizer, attr, module)
+    return count, originals
+
+
+def restore(tts, modules):
+    """Puts the fp32 modules returned by `quantize()` back in place of the quantized ones."""
+    for attr, module in modules.items():
+        setattr(tts.synthesizer, attr, module)
+
+
+def compile_generator(tts):
+    """Compiles the waveform generator (HiFi-GAN in VITS/XTTS, or the separate vocoder); returns its name or None."""
+    import torch
+
+    synthesizer = tts.synthesizer
+    model = synthesizer.tts_model
+    candidates = (
+        ("vocoder", getattr(synthesizer, "vocoder_model", None)),
+        ("waveform_decoder", getattr(model, "waveform_decoder", None)),
+        ("hifigan_decoder", getattr(getattr(model, "hifigan_decoder", None), "waveform_decoder", None)),
+    )
+    for name, module in candidates:
+        if module is not None:
+            # Compiled on the first call, so the first synthesis is slower
+            module.forward = torch.compile(module.forward, dynamic=True)
+            return name
+    return None
+
+
+def _log_spectra(wav, n_fft=1024, hop=256):
+    wav = np.asarray(wav, dtype=np.float32).reshape(-1)
+    if len(wav) < n_fft:
+        wav = np.pad(wav, (0, n_fft - len(wav)))
+    frames = np.lib.stride_tricks.sliding_window_view(wav, n_fft)[::hop] * np.hanning(n_fft)
+    power = np.abs(np.fft.rfft(frames, axis=-1)) ** 2
+    return 10.0 * np.log10(power + 1e-10)
+
+
+def log_spectral_distance(reference, test, floor_db=60.0):
+    """
+    Mean per-frame log-spectral distance in dB over the common length. Both
+    spectra are floored `floor_db` below the reference peak, so differences in
+    near-silent bins do not dominate.
+    """
+    ref, out = _log_spectra(reference), _log_spectra(test)
+    floor = ref.max() - floor_db
+    ref, out = np.maximum(ref, floor), np.maximum(out, floor)
+    frames = min(len(ref), len(out))
+    return float(np.mean(np.sqrt(np.mean((ref[:frames] - out[:frames]) ** 2, axis=-1))))
+
+
+def render_reference(synthesize, sentences=QUALITY_SENTENCES, seed=1234):
+    """Synthesizes the check sentences with a fixed seed; returns `(waveforms, seconds)`."""
+    import torch
+
+    waveforms = []
+    started = time.perf_counter()
+    for sentence in sentences:
+        torch.manual_seed(seed)  # Same sampling noise for both runs
+        waveforms.append(np.asarray(synthesize(sentence), dtype=np.float32).reshape(-1))
+    return waveforms, time.perf_counter() - started
+
+
+def compare(reference, reference_sec, quantized, quantized_sec, max_lsd_db):
+    """Summarizes the quantized waveforms against the fp32 references."""
+    lsd = [log_spectral_distance(r, q) for r, q in zip(reference, quantized)]
+    duration_ratio = [len(q) / len(r) if len(r) else 0.0 for r, q in zip(reference, quantized)]
+    result = {
+        "sentences": len(lsd),
+        "mean_lsd_db": round(float(np.mean(lsd)), 2),
+        "max_lsd_db": round(float(np.max(lsd)), 2),
+        "duration_ratio": [round(ratio, 3) for ratio in duration_ratio],
+        "speedup": round(reference_sec / quantized_sec, 2) if quantized_sec else None,
+        "passed": bool(np.max(lsd) <= max_lsd_db),
+    }
+    if result["passed"]:
+        logger.info(f"Quantization quality check passed: {result}")
+    else:
+        logger.warning(f"Quantization quality check failed (max LSD above {max_lsd_db} dB): {result}")
+    return result
+
+
+class RtfTracker:
+    """Rolling real-time factor (synthesis time / audio duration) per model."""
+
+    def __init__(self, window=50):
+        self._window = window
+        self._samples = {}  # model -> deque of (elapsed, audio_sec)
+        self._lock = threading.Lock()
+
+    def record(self, model_name, elapsed, audio_sec):
+        if audio_sec <= 0:
+            return
+        with self._lock:
+            self._samples.setdefault(model_name, deque(maxlen=self._window)).append((elapsed, audio_sec))
+
+    def stats(self):
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        result = {}
+        for name, values in samples.items():
+            ratios = sorted(elapsed / audio_sec for elapsed, audio_sec in values)
+            result[name] = {
+                "requests": len(values),
+                # Total synthesis time over total audio, so long answers weigh more than "Okay."
+                "rtf": round(sum(e for e, _ in values) / sum(a for _, a in values), 3),
+                "p50_rtf": round(ratios[len(ratios) // 2], 3),
+                "max_rtf": round(ratios[-1], 3),
+            }
+        return result
@@ -0,0 +1,166 @@
+"""
+Inference worker pool for the Coqui TTS API.
+
+Synthesis is synchronous and takes seconds, so it must not run on the event
+loop: `/health` and every other request would stall behind it. Jobs run on a
+dedicated thread pool of `max_workers` threads (the concurrency limit) with at
+most `max_queue` jobs waiting. When the queue is full, `QueueFull` is raised
+immediately so the caller can answer 503 with a Retry-After estimate instead
+of piling up requests that would time out anyway.
+
+`stream()` runs a synchronous generator on a worker and hands its items to
+the event loop one by one, so audio is streamed while the worker is still
+synthesizing.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class InferencePool:
+    def __init__(self, max_workers=1, max_queue=8):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tts-inference")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._duration_avg = None  # exponential moving average of job durations
+        self._closed = False
+
+    def close(self):
+        """Lets queued and running jobs finish, then ends the worker threads."""
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=False)
+
+    def _admit(self):
+        with self._lock:
+            if self._closed:
+                # Only reachable in the moment between a model's eviction and its pool being dropped
+                raise QueueFull(1)
+            if self._queued + self._running >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise QueueFull(self._retry_after_locked())
+            self._queued += 1
+        return time.perf_counter()
+
+    def _retry_after_locked(self):
+        duration = self._duration_avg or 5.0
+        backlog = (self._queued + self._running) / self.max_workers
+        return max(1, math.ceil(duration * backlog))
+
+    def _run(self, fn, enqueued):
+        started = time.perf_counter()
+        wait = started - enqueued
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        if wait > 1.0:
+            logger.info(f"Inference job waited {wait:.2f}s in the queue")
+        try:
+            return fn()
+        finally:
+            duration = time.perf_counter() - started
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                if self._duration_avg is None:
+                    self._duration_avg = duration
+                else:
+                    self._duration_avg = 0.8 * self._duration_avg + 0.2 * duration
+
+    def submit(self, fn):
+        """Queues `fn()`; raises QueueFull when the queue is full."""
+        enqueued = self._admit()
+        return self._executor.submit(self._run, fn, enqueued)
+
+    async def run(self, fn):
+        """Runs `fn()` on a worker and awaits its result."""
+        return await asyncio.wrap_future(self.submit(fn))
+
+    def stream(self, generator_fn):
+        """
+        Queues `generator_fn()` and returns an async iterator over the items it
+        yields. Raises QueueFull right away when the queue is full. If the
+        consumer stops early (client disconnected), the generator is closed
+        after its current item.
+        """
+        enqueued = self._admit()
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, item)
+            except RuntimeError:
+                cancelled.set()  # Event loop is gone
+
+        def produce():
+            generator = generator_fn()
+            try:
+                for item in generator:
+                    if cancelled.is_set():
+                        break
+                    put(item)
+            except Exception as e:
+                put(_Failure(e))
+            finally:
+                generator.close()
+                put(_DONE)
+
+        self._executor.submit(self._run, produce, enqueued)
+
+        async def iterate():
+            try:
+                while True:
+                    item = await items.get()
+                    if item is _DONE:
+                        return
+                    if isinstance(item, _Failure):
+                        raise item.error
+                    yield item
+            finally:
+                cancelled.set()
+
+        return iterate()
+
+    def stats(self):
+        with self._lock:
+            started = self.completed + self._running
+            return {
+                "workers": self.max_workers,
+                "running": self._running,
+                "queue_depth": self._queued,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(1000 * self._wait_total / started, 1) if started else 0.0,
+                "max_wait_ms": round(1000 * self._wait_max, 1),
+                "avg_job_sec": round(self._duration_avg, 2) if self._duration_avg is not None else None,
+            }
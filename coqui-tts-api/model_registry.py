@@ -0,0 +1,141 @@
+"""
+Registry of loaded TTS models for the Coqui TTS API.
+
+Requests pick a model by name (e.g. a fast VITS voice for short
+acknowledgements and XTTS for long answers). Models are loaded on first use;
+concurrent first requests for the same model wait for a single load. Loaded
+models are kept in LRU order and the least recently used ones are evicted
+when their combined size exceeds `max_bytes`. The size of a model is only
+known once it has been loaded, so it is remembered and used to make room
+before the model is loaded again.
+
+An evicted model stays usable by requests that already hold it; its memory is
+released once they finish. `on_evict(name)` lets the caller drop per-model
+resources (worker pools and the like) when that happens.
+"""
+import gc
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ModelLoadError(Exception):
+    """Raised when a model fails to load."""
+
+
+class ModelRegistry:
+    def __init__(self, loader, size_fn, allowed, max_bytes=0, on_evict=None):
+        self._loader = loader
+        self._size_fn = size_fn
+        self._on_evict = on_evict
+        self.allowed = list(dict.fromkeys(allowed))
+        self._max_bytes = int(max_bytes)
+        self._models = OrderedDict()  # name -> (model, size in bytes), least recently used first
+        self._sizes = {}  # name -> size of the last load
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = {}
+
+    def is_allowed(self, name):
+        return name in self.allowed
+
+    def peek(self, name):
+        """Returns the model if it is loaded, without loading it or touching the LRU order."""
+        with self._lock:
+            entry = self._models.get(name)
+        return entry[0] if entry is not None else None
+
+    def get(self, name):
+        """Returns the loaded model, loading it first if needed. Raises ValueError for a model outside the allowlist."""
+        if not self.is_allowed(name):
+            raise ValueError(f"Unknown model '{name}'. Available models: {', '.join(self.allowed)}.")
+
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                self._models.move_to_end(name)
+                return entry[0]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # One load per model, concurrent requests wait for it
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    self._models.move_to_end(name)
+                    return entry[0]
+                # Make room up front if the size is known from an earlier load
+                evicted = self._evict_locked(self._sizes.get(name, 0))
+            self._release(evicted)
+
+            started = time.perf_counter()
+            try:
+                model = self._loader(name)
+            except Exception as e:
+                raise ModelLoadError(f"Failed to load TTS model '{name}': {e}") from e
+            elapsed = time.perf_counter() - started
+            size = self._size_fn(model)
+            logger.info(f"Loaded TTS model '{name}' ({size / 2**20:.0f} MB) in {elapsed:.1f}s")
+
+            with self._lock:
+                self._models[name] = (model, size)
+                self._sizes[name] = size
+                self.loads += 1
+                self.load_seconds[name] = round(elapsed, 2)
+                self._load_locks.pop(name, None)
+                evicted = self._evict_locked(0, keep=name)
+            self._release(evicted)
+            return model
+
+    def _evict_locked(self, incoming, keep=None):
+        """Drops least recently used models until `incoming` more bytes fit in the budget."""
+        if not self._max_bytes:
+            return []
+        evicted = []
+        total = sum(size for _, size in self._models.values())
+        for name in list(self._models):
+            if total + incoming <= self._max_bytes:
+                break
+            if name == keep:
+                continue
+            _, size = self._models.pop(name)
+            total -= size
+            evicted.append(name)
+            self.evictions += 1
+        return evicted
+
+    def _release(self, evicted):
+        if not evicted:
+            return
+        logger.info(f"Evicted TTS model(s) {', '.join(evicted)} to stay within the memory budget")
+        if self._on_evict is not None:
+            for name in evicted:
+                try:
+                    self._on_evict(name)
+                except Exception as e:
+                    logger.error(f"Cleanup after evicting '{name}' failed: {e}", exc_info=True)
+        gc.collect()
+        try:
+            import torch
+
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "allowed": self.allowed,
+                "loaded": {name: round(size / 2**20, 1) for name, (_, size) in self._models.items()},
+                "loaded_mb": round(sum(size for _, size in self._models.values()) / 2**20, 1),
+                "max_mb": round(self._max_bytes / 2**20, 1) if self._max_bytes else None,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_seconds": dict(self.load_seconds),
+            }
@@ -0,0 +1,151 @@
+"""
+Speaker conditioning cache for XTTS voice cloning.
+
+Cloning a voice means loading the reference WAV, resampling it and running
+it through the GPT conditioning encoder and the speaker encoder. Passing
+`speaker_wav` to `TTS.tts()` repeats that for every request. The resulting
+`(gpt_cond_latent, speaker_embedding)` pair only depends on the file and the
+model, so it is computed once per (path, mtime, model), kept in memory and
+persisted as `.npz` so restarts skip the work as well.
+
+Speakers are addressed by ID: the file name (without extension) of a WAV in
+the speaker directory, or the name of one of the model's built-in speakers.
+"""
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SpeakerLatentCache:
+    def __init__(self, speaker_dir, cache_dir=None):
+        self.speaker_dir = speaker_dir
+        self.cache_dir = cache_dir
+        self._entries = {}  # (path, mtime_ns, model_name) -> (gpt_cond_latent, speaker_embedding)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.computed = 0
+
+    def speaker_files(self):
+        """Returns {speaker_id: path} for every WAV in the speaker directory."""
+        try:
+            names = sorted(os.listdir(self.speaker_dir))
+        except OSError:
+            return {}
+        return {
+            os.path.splitext(name)[0]: os.path.join(self.speaker_dir, name)
+            for name in names
+            if name.lower().endswith(".wav")
+        }
+
+    def resolve(self, model, model_name, speaker_id):
+        """
+        Returns the conditioning for a speaker ID, or None if it is neither a
+        WAV in the speaker directory nor a built-in speaker of the model.
+        """
+        path = self.speaker_files().get(speaker_id)
+        if path:
+            return self.get(model, model_name, path)
+        speakers = getattr(getattr(model, "speaker_manager", None), "speakers", None) or {}
+        if speaker_id in speakers:
+            return speakers[speaker_id]["gpt_cond_latent"], speakers[speaker_id]["speaker_embedding"]
+        return None
+
+    def get(self, model, model_name, speaker_wav):
+        """Returns `(gpt_cond_latent, speaker_embedding)` for a reference WAV."""
+        path = os.path.realpath(speaker_wav)
+        key = (path, os.stat(path).st_mtime_ns, model_name)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.memory_hits += 1
+                return entry
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # One computation per speaker, concurrent requests wait for it
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.memory_hits += 1
+                    return entry
+
+            entry = self._load_disk(key)
+            if entry is not None:
+                with self._lock:
+                    self.disk_hits += 1
+            else:
+                entry = self._compute(model, path)
+                self._save_disk(key, entry)
+                with self._lock:
+                    self.computed += 1
+
+            with self._lock:
+                # Drop latents of older versions of the same file
+                for stale in [k for k in self._entries if k[0] == path and k[2] == key[2]]:
+                    del self._entries[stale]
+                self._entries[key] = entry
+                self._key_locks.pop(key, None)
+            return entry
+
+    def _compute(self, model, path):
+        logger.info(f"Computing speaker conditioning latents for {path}")
+        config = model.config
+        gpt_cond_latent, speaker_embedding = model.get_conditioning_latents(
+            audio_path=[path],
+            gpt_cond_len=config.gpt_cond_len,
+            gpt_cond_chunk_len=config.gpt_cond_chunk_len,
+            max_ref_length=config.max_ref_len,
+            sound_norm_refs=config.sound_norm_refs,
+        )
+        return gpt_cond_latent.detach().cpu(), speaker_embedding.detach().cpu()
+
+    def _disk_path(self, key):
+        path, mtime_ns, model_name = key
+        digest = hashlib.sha1(f"{path}|{mtime_ns}|{model_name}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{os.path.splitext(os.path.basename(path))[0]}-{digest}.npz")
+
+    def _load_disk(self, key):
+        if not self.cache_dir:
+            return None
+        file_path = self._disk_path(key)
+        if not os.path.exists(file_path):
+            return None
+        try:
+            import torch
+
+            with np.load(file_path) as data:
+                return torch.from_numpy(data["gpt_cond_latent"]), torch.from_numpy(data["speaker_embedding"])
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable speaker latent file {file_path}: {e}")
+            return None
+
+    def _save_disk(self, key, entry):
+        if not self.cache_dir:
+            return
+        file_path = self._disk_path(key)
+        temp_path = f"{file_path}.{os.getpid()}.tmp.npz"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.savez(temp_path, gpt_cond_latent=entry[0].numpy(), speaker_embedding=entry[1].numpy())
+            os.replace(temp_path, file_path)
+            logger.info(f"Saved speaker conditioning latents to {file_path}")
+        except OSError as e:
+            logger.warning(f"Could not persist speaker latents to {file_path}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cached_speakers": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "computed": self.computed,
+            }
+
@@ -0,0 +1,86 @@
+"""
+Text helpers for the Coqui TTS API.
+
+Responses are synthesized sentence by sentence so the first sentence can be
+streamed while the rest is still being generated. The splitter is a plain
+regex on sentence-final punctuation; overly long sentences are further cut at
+clause boundaries (XTTS degrades above ~250 characters), and fragments that
+are too short to be spoken naturally ("Ok.") are merged into their neighbour.
+"""
+import re
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…。！？])[\"'”’)\]]*\s+")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Collapses whitespace and strips the ends."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _split_long(sentence, max_chars):
+    """Cuts a sentence longer than `max_chars` at commas, then at spaces."""
+    if len(sentence) <= max_chars:
+        return [sentence]
+
+    parts = []
+    current = ""
+    for clause in _CLAUSE_END.split(sentence):
+        if current and len(current) + 1 + len(clause) > max_chars:
+            parts.append(current)
+            current = clause
+        else:
+            current = f"{current} {clause}" if current else clause
+    if current:
+        parts.append(current)
+
+    result = []
+    for part in parts:
+        while len(part) > max_chars:
+            cut = part.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            result.append(part[:cut].strip())
+            part = part[cut:].strip()
+        if part:
+            result.append(part)
+    return result
+
+
+def split_sentences(text, max_chars=250, min_chars=12):
+    """
+    Splits text into sentences for incremental synthesis.
+
+    Every returned piece is at most `max_chars` long; pieces shorter than
+    `min_chars` are joined with the following one (or the previous one at the
+    end of the text).
+    """
+    text = normalize_text(text)
+    if not text:
+        return []
+
+    pieces = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if sentence:
+            pieces.extend(_split_long(sentence, max_chars))
+
+    merged = []
+    pending = ""
+    for piece in pieces:
+        candidate = f"{pending} {piece}" if pending else piece
+        if len(candidate) < min_chars:
+            pending = candidate
+        elif pending and len(candidate) > max_chars:
+            merged.extend([pending, piece])
+            pending = ""
+        else:
+            merged.append(candidate)
+            pending = ""
+    if pending:
+        if merged and len(merged[-1]) + 1 + len(pending) <= max_chars:
+            merged[-1] = f"{merged[-1]} {pending}"
+        else:
+            merged.append(pending)
+    return merged
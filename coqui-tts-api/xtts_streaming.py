@@ -0,0 +1,78 @@
+"""
+XTTS synthesis helpers for the Coqui TTS API.
+
+Both helpers take precomputed speaker conditioning (see speaker_cache.py)
+instead of a speaker WAV, and use the sampling settings from the model config
+like `TTS.tts()` does.
+
+`TTS.tts()` only returns after the GPT decoder has produced every audio
+token of a sentence and the vocoder has run over all of them. For streaming,
+XTTS can instead decode in fixed-size token chunks (`Xtts.inference_stream`):
+every `chunk_size` tokens the latents so far are vocoded, the new part is
+cross-faded with the previous chunk over `overlap` samples and yielded, so the
+first audio is ready after the first chunk rather than the whole sentence.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def is_xtts(tts):
+    """True if the loaded TTS object wraps an XTTS model."""
+    model = getattr(getattr(tts, "synthesizer", None), "tts_model", None)
+    return model is not None and hasattr(model, "inference_stream")
+
+
+def get_xtts_model(tts):
+    return tts.synthesizer.tts_model
+
+
+def builtin_conditioning(model, name=None):
+    """Returns `(gpt_cond_latent, speaker_embedding)` of a built-in speaker (default: the first one)."""
+    speakers = getattr(getattr(model, "speaker_manager", None), "speakers", None) or {}
+    if not speakers:
+        raise ValueError("No speaker WAV configured and the XTTS model has no built-in speakers.")
+    speaker = speakers[name if name in speakers else next(iter(speakers))]
+    return speaker["gpt_cond_latent"], speaker["speaker_embedding"]
+
+
+def _sampling_options(model):
+    config = model.config
+    return {
+        "temperature": config.temperature,
+        "length_penalty": config.length_penalty,
+        "repetition_penalty": config.repetition_penalty,
+        "top_k": config.top_k,
+        "top_p": config.top_p,
+    }
+
+
+def synthesize_sentence(model, text, language, conditioning):
+    """Synthesizes one sentence in a single pass with precomputed conditioning."""
+    gpt_cond_latent, speaker_embedding = conditioning
+    output = model.inference(
+        text,
+        language,
+        gpt_cond_latent,
+        speaker_embedding,
+        enable_text_splitting=False,
+        **_sampling_options(model),
+    )
+    return output["wav"]
+
+
+def stream_sentence(model, text, language, conditioning, chunk_size=20, overlap=1024):
+    """Yields float32 NumPy waveform chunks of one sentence as they are decoded."""
+    gpt_cond_latent, speaker_embedding = conditioning
+    chunks = model.inference_stream(
+        text,
+        language,
+        gpt_cond_latent,
+        speaker_embedding,
+        stream_chunk_size=chunk_size,
+        overlap_wav_len=overlap,
+        enable_text_splitting=False,
+        **_sampling_options(model),
+    )
+    for chunk in chunks:
+        yield chunk.detach().float().cpu().numpy()
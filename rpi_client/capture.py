@@ -0,0 +1,124 @@
+"""
+Microphone capture for the Raspberry Pi client.
+
+One PyAudio input stream stays open for the lifetime of the client. Its
+callback copies every buffer into a ring of preallocated frames and stamps it
+with its capture time. Wake-word detection and recording each read through
+their own `CaptureReader` cursor, so switching from one to the other neither
+reopens the device (tens of milliseconds) nor drops the audio in between, and
+a recording can start `preroll_frames` in the past to keep the first syllables
+that arrived while the wake word was still being decoded.
+"""
+import threading
+import time
+
+import numpy as np
+import pyaudio
+
+
+class CaptureClosed(Exception):
+    """Raised by `CaptureReader.read()` once the capture is closed and the reader has caught up."""
+
+
+class AudioCapture:
+    def __init__(self, audio_interface, rate, frames_per_buffer, ring_sec=5.0, input_device_index=None):
+        self._pa = audio_interface
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self._device_index = input_device_index
+        self.slots = max(2, int(ring_sec * rate / frames_per_buffer))
+        self._frames = np.zeros((self.slots, frames_per_buffer), dtype=np.int16)
+        self._lengths = np.zeros(self.slots, dtype=np.int32)
+        self._times = np.zeros(self.slots, dtype=np.float64)
+        self._written = 0  # total frames written; frame n lives in slot n % slots
+        self._cond = threading.Condition()
+        self._stream = None
+        self.overflows = 0  # buffers PortAudio reported as overflowed
+
+    @property
+    def is_running(self):
+        return self._stream is not None
+
+    def start(self):
+        """Opens the input stream if it isn't open yet."""
+        if self._stream is not None:
+            return
+        self._stream = self._pa.open(format=pyaudio.paInt16,
+                                     channels=1,
+                                     rate=self.rate,
+                                     input=True,
+                                     frames_per_buffer=self.frames_per_buffer,
+                                     input_device_index=self._device_index,
+                                     stream_callback=self._callback)
+        self._stream.start_stream()
+        print(f"Capture stream open ({self.slots} x {self.frames_per_buffer} frame ring, "
+              f"{self.slots * self.frames_per_buffer / self.rate:.1f}s)")
+
+    def close(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                if stream.is_active():
+                    stream.stop_stream()
+                stream.close()
+            except Exception as e:
+                print(f"Error closing capture stream: {e}")
+        with self._cond:
+            self._cond.notify_all()
+
+    def reader(self, preroll_frames=0, start=None):
+        """
+        Returns a cursor that reads from the live position, or `preroll_frames`
+        before it (or before frame number `start`), limited to what the ring
+        still holds.
+        """
+        with self._cond:
+            position = self._written if start is None else min(start, self._written)
+            oldest = max(0, self._written - self.slots + 1)
+            return CaptureReader(self, max(oldest, position - preroll_frames))
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        if status & pyaudio.paInputOverflow:
+            self.overflows += 1
+        samples = np.frombuffer(in_data, dtype="<i2")[:self.frames_per_buffer]
+        with self._cond:
+            slot = self._written % self.slots
+            self._frames[slot, :len(samples)] = samples
+            self._lengths[slot] = len(samples)
+            self._times[slot] = time.time()
+            self._written += 1
+            self._cond.notify_all()
+        return (None, pyaudio.paContinue)
+
+
+class CaptureReader:
+    """An independent read position in the capture ring."""
+
+    def __init__(self, capture, position):
+        self._capture = capture
+        self.position = position  # number of the next frame to read
+        self.dropped = 0  # frames overwritten before this reader got to them
+
+    def read(self, timeout=1.0):
+        """
+        Returns `(pcm_bytes, capture_time)` of the next frame, or `(None, None)`
+        on timeout. Raises CaptureClosed when no more frames will come.
+        """
+        capture = self._capture
+        with capture._cond:
+            if capture._written <= self.position:
+                capture._cond.wait_for(lambda: capture._written > self.position or not capture.is_running, timeout)
+                if capture._written <= self.position:
+                    if not capture.is_running:
+                        raise CaptureClosed()
+                    return None, None
+            behind = capture._written - self.position
+            if behind > capture.slots:
+                # Too slow: the oldest frames were overwritten, continue with the oldest one still there
+                self.dropped += behind - capture.slots
+                self.position = capture._written - capture.slots
+            slot = self.position % capture.slots
+            pcm = capture._frames[slot, :capture._lengths[slot]].tobytes()
+            captured_at = float(capture._times[slot])
+            self.position += 1
+        return pcm, captured_at
@@ -6,10 +6,13 @@ import json
 import sys
 import signal
 import os # Import os to access environment variables
-import struct # Required for unpacking audio data
-import audioop # For RMS calculation
 from dotenv import load_dotenv # Optional: pip install python-dotenv
 
+from capture import AudioCapture, CaptureClosed
+from playback import AudioPlayer
+from upstream import OPUS_AVAILABLE, PCM_FORMAT, create_encoder, hello_message
+from vad import EnergyGate, Endpointer
+
 # Optional: Load .env file from the current directory if it exists
 # Useful if you prefer managing the client config via a local .env
 # load_dotenv()
@@ -33,6 +36,20 @@ WAKE_WORD_SENSITIVITY = 0.5  # Not directly used by Vosk but kept for compatibil
 # Use small model for wake word detection (vosk-model-small-en-us-0.15)
 VOSK_MODEL_PATH = "vosk-model-small-en-us-0.15"  # Set to path where you downloaded and extracted the model
 
+# Restrict Vosk to the wake phrase plus a garbage token instead of the full open vocabulary.
+# Decoding against a two-entry grammar is far cheaper and does not match look-alike phrases.
+WAKE_WORD_GRAMMAR = os.getenv('WAKE_WORD_GRAMMAR', 'true').lower() == 'true'
+# Energy gate in front of Vosk: only buffers this many dB above the adaptive noise floor
+# (plus a hangover and a short pre-roll) reach the recognizer, so a silent room costs almost no CPU
+ENERGY_GATE_ENABLED = os.getenv('ENERGY_GATE_ENABLED', 'true').lower() == 'true'
+ENERGY_GATE_MARGIN_DB = float(os.getenv('ENERGY_GATE_MARGIN_DB', '9'))
+ENERGY_GATE_HANGOVER_SEC = float(os.getenv('ENERGY_GATE_HANGOVER_SEC', '0.5'))
+ENERGY_GATE_PREROLL_SEC = float(os.getenv('ENERGY_GATE_PREROLL_SEC', '0.2'))
+# After this long above the floor without a break the level is taken as the new background (e.g. a fan
+# that started), otherwise the gate and the endpointer would treat it as voice indefinitely
+NOISE_FLOOR_RESEED_SEC = float(os.getenv('NOISE_FLOOR_RESEED_SEC', '8'))
+WAKE_STATS_INTERVAL_SEC = 60 # How often idle CPU use and gate statistics are printed
+
 # !!! CONFIGURATION (now primarily from environment variables) !!!
 # The RPi Client runs OUTSIDE Docker, so it needs the HOST IP where Docker exposes the backend port.
 # Set the WEBSOCKET_URL environment variable before running this script.
@@ -48,8 +65,30 @@ FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 16000 # Sample Rate
 FRAMES_PER_BUFFER = 1024 # Chunk size for processing audio
-SILENCE_THRESHOLD = 500  # RMS threshold for considering audio as silence (adjust as needed)
-SILENCE_DURATION_SEC = 2.0 # How many seconds of silence triggers stop
+
+# End of command detection against the adaptive noise floor (see vad.Endpointer).
+# Aggressiveness 0-3: higher needs louder speech and ends sooner after it stops (0.55 s down to 0.3 s)
+ENDPOINT_AGGRESSIVENESS = min(max(int(os.getenv('ENDPOINT_AGGRESSIVENESS', '2')), 0), 3)
+ENDPOINT_SILENCE_SEC = os.getenv('ENDPOINT_SILENCE_SEC') # Overrides the preset's trailing silence
+ENDPOINT_MIN_SPEECH_SEC = float(os.getenv('ENDPOINT_MIN_SPEECH_SEC', '0.25')) # Shorter noises don't count as a command
+NO_SPEECH_TIMEOUT_SEC = float(os.getenv('NO_SPEECH_TIMEOUT_SEC', '3.0')) # Stop if nothing is said after the wake word
+
+# The microphone stays open and fills a ring buffer that wake word detection and recording both read.
+# A recording starts RECORDING_PREROLL_SEC before the wake word was detected, so words spoken while
+# it was still being decoded are kept.
+CAPTURE_RING_SEC = float(os.getenv('CAPTURE_RING_SEC', '5'))
+RECORDING_PREROLL_SEC = float(os.getenv('RECORDING_PREROLL_SEC', '0.5'))
+
+# Playback of the response runs on its own thread. It starts once this much audio is buffered,
+# so receiving and playing overlap without stuttering on a slow network
+PLAYBACK_PREBUFFER_MS = float(os.getenv('PLAYBACK_PREBUFFER_MS', '200'))
+PLAYBACK_RATE = int(os.getenv('PLAYBACK_RATE', '0')) # Output device rate, 0 = the device's default rate
+PLAYBACK_PCM_RATE = int(os.getenv('PLAYBACK_PCM_RATE', '22050')) # Rate assumed for audio without a WAV header
+
+# Format of the recorded audio sent to the backend: 'pcm_s16le' (256 kbit/s) or 'opus' (~24 kbit/s, needs opuslib).
+# Opus is requested in a hello message on connect; the client falls back to PCM unless the backend acknowledges it.
+UPSTREAM_FORMAT = os.getenv('UPSTREAM_FORMAT', 'pcm_s16le').lower()
+OPUS_BITRATE = int(os.getenv('OPUS_BITRATE', '24000'))
 
 class VoiceClient:
     def __init__(self, websocket_url):
@@ -58,12 +97,22 @@ class VoiceClient:
         self.ws_thread = None
         self.ws_connected = threading.Event()
         self.audio_interface = pyaudio.PyAudio()
-        self.audio_stream_input = None
-        self.audio_stream_output = None
+        self.capture = AudioCapture(self.audio_interface, RATE, FRAMES_PER_BUFFER, ring_sec=CAPTURE_RING_SEC)
+        self.player = AudioPlayer(self.audio_interface,
+                                  device_rate=PLAYBACK_RATE or None,
+                                  prebuffer_ms=PLAYBACK_PREBUFFER_MS,
+                                  period_frames=FRAMES_PER_BUFFER,
+                                  pcm_rate=PLAYBACK_PCM_RATE)
+        self.player.start()
         self.recording = False
         self.stop_event = threading.Event()
         self.last_audio_receive_time = 0
-        self.last_speech_time = 0 # Track time of last non-silent audio chunk
+        self.endpointer = None
+        self.energy_gate = None # Wake word gate; its noise floor seeds the endpointer
+        self.upstream_format = PCM_FORMAT # Agreed with the backend in the hello handshake
+        self.encoder = None
+        if UPSTREAM_FORMAT == 'opus' and not OPUS_AVAILABLE:
+            print("UPSTREAM_FORMAT=opus but opuslib/libopus is not available. Sending raw PCM.")
 
         # --- Wake Word Engine Initialization ---
         self.wake_word_engine = None
@@ -82,10 +131,16 @@ class VoiceClient:
                 
                 # Initialize Vosk model
                 model = Model(VOSK_MODEL_PATH)
-                self.vosk_recognizer = KaldiRecognizer(model, RATE)
-                
-                # Set partial mode for faster response (wake word detection)
-                self.vosk_recognizer.SetPartialWords(True)
+                if WAKE_WORD_GRAMMAR:
+                    # Closed grammar: the wake phrase, everything else maps to [unk]
+                    grammar = json.dumps([WAKE_WORD.lower(), "[unk]"])
+                    self.vosk_recognizer = KaldiRecognizer(model, RATE, grammar)
+                    print(f"Vosk restricted to grammar {grammar}")
+                else:
+                    self.vosk_recognizer = KaldiRecognizer(model, RATE)
+
+                # Only the text is needed, not word timings or alternatives
+                self.vosk_recognizer.SetPartialWords(False)
                 self.vosk_recognizer.SetMaxAlternatives(0)
                 self.wake_word_engine = True  # Flag that we have a wake word engine
                 
@@ -111,6 +166,9 @@ class VoiceClient:
                 # Set a timeout for the connection attempt
                 self.ws = websocket.create_connection(self.websocket_url, timeout=10)
                 print("WebSocket connected.")
+                self.upstream_format = PCM_FORMAT
+                if UPSTREAM_FORMAT != PCM_FORMAT and OPUS_AVAILABLE:
+                    self.ws.send(json.dumps(hello_message(UPSTREAM_FORMAT, RATE)))
                 self.ws_connected.set() # Signal that connection is established
                 self._receive_loop() # Start receiving messages in this thread
             except websocket.WebSocketException as e:
@@ -134,8 +192,8 @@ class VoiceClient:
                 self.last_audio_receive_time = time.time() # Track time for silence detection
 
                 if isinstance(message, bytes):
-                    # Play received audio data
-                    self._play_audio(message)
+                    # Queue received audio; the player thread plays it
+                    self.player.feed(message)
                 else:
                     # Handle JSON messages (z.B. errors, commands)
                     print(f"Received text message: {message}")
@@ -143,6 +201,13 @@ class VoiceClient:
                         msg_data = json.loads(message)
                         if msg_data.get('error'):
                             print(f"Error from server: {msg_data['error']}")
+                            self.player.end_of_stream()
+                        elif msg_data.get('event') == 'helloAck':
+                            self.upstream_format = msg_data.get('audio', {}).get('format', PCM_FORMAT)
+                            print(f"Backend accepted upstream audio format: {self.upstream_format}")
+                        elif msg_data.get('event') == 'audioEnd':
+                            # Response complete: play out what is buffered, even below the pre-buffer
+                            self.player.end_of_stream()
                         elif msg_data.get('event') == 'noSpeechDetected':
                             print("Server indicated no speech was detected.")
                     except json.JSONDecodeError:
@@ -153,99 +218,32 @@ class VoiceClient:
             print(f"Error in receive loop: {e}")
         finally:
             print("Receive loop finished.")
+            self.player.end_of_stream()
             self.ws_connected.clear() # Signal disconnection
 
 
-    def _play_audio(self, audio_data):
-        """Plays audio data using PyAudio."""
-        try:
-            if self.audio_stream_output is None or not self.audio_stream_output.is_active():
-                self.audio_stream_output = self.audio_interface.open(format=FORMAT,
-                                                                    channels=CHANNELS,
-                                                                    rate=RATE,
-                                                                    output=True,
-                                                                    frames_per_buffer=FRAMES_PER_BUFFER)
-            self.audio_stream_output.write(audio_data)
-        except Exception as e:
-            print(f"Error playing audio: {e}")
-            if self.audio_stream_output:
-                try:
-                    self.audio_stream_output.stop_stream()
-                    self.audio_stream_output.close()
-                except Exception as close_err:
-                    print(f"Error closing output stream: {close_err}")
-                finally:
-                    self.audio_stream_output = None
-
-
-    def _close_output_stream(self):
-        """Closes the audio output stream if open."""
-        if self.audio_stream_output:
-            print("Closing audio output stream.")
-            try:
-                time.sleep(0.2)
-                if self.audio_stream_output.is_active():
-                    self.audio_stream_output.stop_stream()
-                self.audio_stream_output.close()
-            except Exception as e:
-                print(f"Error closing output stream: {e}")
-            finally:
-                self.audio_stream_output = None
-
     def _listen_for_wake_word(self):
         """Listens for wake word using the microphone."""
         if self.recording: # Should not happen, but safety check
             return
 
         print("Starting wake word listening...")
-        input_device_index = None # Use default input device
-        stream = None
 
         try:
             # --- Wake Word Engine Logic ---
             if self.wake_word_engine and self.vosk_recognizer:
-                stream = self.audio_interface.open(
-                    rate=RATE,
-                    channels=CHANNELS,
-                    format=FORMAT,
-                    input=True,
-                    frames_per_buffer=FRAMES_PER_BUFFER,
-                    input_device_index=input_device_index)
+                self.capture.start()
+                reader = self.capture.reader()
 
                 print(f"Listening for wake word '{WAKE_WORD}'... (Press Ctrl+C to exit)")
                 
                 sys.stdout.write("🎤 ")
                 sys.stdout.flush()
-                
-                detection_time = time.time()
-                
-                while not self.stop_event.is_set():
-                    audio_data = stream.read(FRAMES_PER_BUFFER, exception_on_overflow=False)
-                    
-                    current_time = time.time()
-                    if current_time - detection_time >= 5:
-                        sys.stdout.write("🎤 ")
-                        sys.stdout.flush()
-                        detection_time = current_time
-                    
-                    if self.vosk_recognizer.AcceptWaveform(audio_data):
-                        result = json.loads(self.vosk_recognizer.Result())
-                        text = result.get("text", "").lower()
-                        if WAKE_WORD.lower() in text:
-                            print(f"\n✅ Wake word '{WAKE_WORD}' detected in: '{text}'")
-                            stream.stop_stream()
-                            stream.close()
-                            self._start_recording()  # Start recording audio for command
-                            return  # Exit wake word loop
-                    else:
-                        partial = json.loads(self.vosk_recognizer.PartialResult())
-                        partial_text = partial.get("partial", "").lower()
-                        if WAKE_WORD.lower() in partial_text:
-                            print(f"\n✅ Wake word '{WAKE_WORD}' detected in partial: '{partial_text}'")
-                            stream.stop_stream()
-                            stream.close()
-                            self._start_recording()  # Start recording audio for command
-                            return  # Exit wake word loop
+
+                if self._wake_word_loop(reader):
+                    # Continue right where wake word detection stopped (plus the pre-roll)
+                    self._start_recording(start=reader.position)
+                    return  # Exit wake word loop
             else:
                 print("--- Press Enter to simulate wake word ---")
                 enter_pressed = threading.Event()
@@ -272,65 +270,162 @@ class VoiceClient:
              print(f"Error during wake word listening: {e}")
              time.sleep(1)
         finally:
-            if stream and stream.is_active():
-                stream.stop_stream()
-                stream.close()
             print("Wake word listening stopped.")
 
 
-    def _audio_callback(self, in_data, frame_count, time_info, status):
-        """Callback function for PyAudio stream. Sends audio data via WebSocket and checks for silence."""
-        is_silent = False
-        try:
-            # Calculate RMS of the current chunk
-            rms = audioop.rms(in_data, self.audio_interface.get_sample_size(FORMAT))
-            if rms < SILENCE_THRESHOLD:
-                is_silent = True
-            else:
-                self.last_speech_time = time.time() # Update time of last speech detected
-
-        except Exception as rms_err:
-            print(f"Error calculating RMS: {rms_err}")
+    def _wake_word_loop(self, reader):
+        """Reads the capture ring until the wake word is heard (returns True) or the client stops."""
+        buffer_sec = FRAMES_PER_BUFFER / RATE
+        gate = None
+        if ENERGY_GATE_ENABLED:
+            gate = EnergyGate(
+                margin_db=ENERGY_GATE_MARGIN_DB,
+                hangover_frames=round(ENERGY_GATE_HANGOVER_SEC / buffer_sec),
+                preroll_frames=round(ENERGY_GATE_PREROLL_SEC / buffer_sec),
+                reseed_frames=round(NOISE_FLOOR_RESEED_SEC / buffer_sec) or None,
+            )
+        self.energy_gate = gate
+        recognizer = self.vosk_recognizer
+        wake_word = WAKE_WORD.lower()
+        last_partial = None
+        gate_was_open = False
+        onset_time = None
+
+        indicator_time = stats_time = time.time()
+        stats_cpu = time.process_time()
 
+        while not self.stop_event.is_set():
+            try:
+                audio_data, captured_at = reader.read()
+            except CaptureClosed:
+                print("\nCapture closed, wake word detection stops.")
+                return False
+            if audio_data is None:
+                continue
+            current_time = time.time()
+
+            if current_time - indicator_time >= 5:
+                sys.stdout.write("🎤 ")
+                sys.stdout.flush()
+                indicator_time = current_time
+            if current_time - stats_time >= WAKE_STATS_INTERVAL_SEC:
+                cpu = (time.process_time() - stats_cpu) / (current_time - stats_time) * 100
+                gated = f", {gate.pass_ratio() * 100:.0f}% of audio passed the energy gate (noise floor {gate.noise_floor.db:.0f} dBFS)" if gate else ""
+                print(f"\n[wake word] CPU {cpu:.1f}% of one core{gated}")
+                stats_time, stats_cpu = current_time, time.process_time()
+
+            if gate:
+                buffers = gate.process(audio_data, now=captured_at)
+                if not buffers:
+                    if gate_was_open:
+                        # Voice ended: flush the utterance (which also resets the recognizer)
+                        gate_was_open = False
+                        last_partial = None
+                        text = json.loads(recognizer.FinalResult()).get("text", "")
+                        if wake_word in text:
+                            self._report_wake_word(text, onset_time, current_time)
+                            return True
+                    continue
+                if not gate_was_open:
+                    gate_was_open = True
+                    onset_time = gate.opened_at
+            else:
+                buffers = [audio_data]
+                onset_time = onset_time or captured_at
+
+            for buffer in buffers:
+                if recognizer.AcceptWaveform(buffer):
+                    last_partial = None
+                    text = json.loads(recognizer.Result()).get("text", "")
+                    if wake_word in text:
+                        self._report_wake_word(text, onset_time, current_time)
+                        recognizer.Reset()
+                        return True
+                    if not gate:
+                        onset_time = None
+                else:
+                    # The partial string is unchanged for most buffers; only parse it when it changes
+                    partial = recognizer.PartialResult()
+                    if partial == last_partial:
+                        continue
+                    last_partial = partial
+                    partial_text = json.loads(partial).get("partial", "")
+                    if wake_word in partial_text:
+                        self._report_wake_word(partial_text, onset_time, current_time)
+                        recognizer.Reset()
+                        return True
+        return False
+
+    def _report_wake_word(self, text, onset_time, detected_time):
+        # Latency from the first voiced buffer (start of the wake phrase) to the detection
+        latency = f" {(detected_time - onset_time) * 1000:.0f} ms after voice onset" if onset_time else ""
+        print(f"\n✅ Wake word '{WAKE_WORD}' detected in: '{text}'{latency}")
+
+    def _process_recorded_frame(self, in_data, captured_at):
+        """Sends one recorded frame via WebSocket and checks whether the command has ended."""
         if self.recording and self.ws_connected.is_set():
             try:
-                self.ws.send(in_data, websocket.ABNF.OPCODE_BINARY)
+                payload = self.encoder.encode(in_data)
+                if payload:
+                    self.ws.send(payload, websocket.ABNF.OPCODE_BINARY)
             except websocket.WebSocketException as e:
                 print(f"Error sending audio chunk via WebSocket: {e}")
             except Exception as e:
-                print(f"Unexpected error in audio callback: {e}")
+                print(f"Unexpected error sending audio: {e}")
 
-        # Check for silence duration outside the WebSocket send block
-        if self.recording and is_silent:
-            if time.time() - self.last_speech_time > SILENCE_DURATION_SEC:
-                print(f"\nSilence detected for > {SILENCE_DURATION_SEC} seconds.")
+        if self.recording:
+            decision = self.endpointer.process(in_data, captured_at)
+            if decision:
+                self._report_endpoint(decision, captured_at)
                 self.recording = False # Signal the recording loop to stop
-                print("Signaling recording loop to stop due to silence.")
 
-        return (in_data, pyaudio.paContinue)
-
-
-    def _start_recording(self):
-        """Starts recording audio and streaming it to the backend."""
+    def _report_endpoint(self, decision, captured_at):
+        endpointer = self.endpointer
+        # Processing lag: how long after capture the deciding buffer was handled
+        lag_ms = (time.time() - captured_at) * 1000
+        settings = (f"floor {endpointer.noise_floor.db:.0f} dBFS, margin {endpointer.margin_db:.0f} dB, "
+                    f"aggressiveness {endpointer.aggressiveness}")
+        if decision == "no_speech":
+            print(f"\n[endpoint] No speech within {endpointer.no_speech_timeout_sec:.1f}s ({settings})")
+            return
+        speech_start = endpointer.speech_started_at - endpointer.started_at
+        print(f"\n[endpoint] Speech from {speech_start:.2f}s, {endpointer.speech_sec:.2f}s voiced; "
+              f"end declared {endpointer.decision_delay() * 1000:.0f} ms after the last speech "
+              f"(+{lag_ms:.0f} ms processing lag; {settings})")
+
+
+    def _start_recording(self, start=None):
+        """
+        Starts recording audio and streaming it to the backend. `start` is the
+        capture frame wake word detection stopped at; the recording begins
+        RECORDING_PREROLL_SEC before it (or before now).
+        """
         if self.recording:
             return
         if not self.ws_connected.is_set():
             print("Cannot start recording: WebSocket not connected.")
             return
 
+        self.encoder = create_encoder(self.upstream_format, RATE, OPUS_BITRATE)
+        self.endpointer = Endpointer(
+            frame_sec=FRAMES_PER_BUFFER / RATE,
+            aggressiveness=ENDPOINT_AGGRESSIVENESS,
+            end_silence_sec=float(ENDPOINT_SILENCE_SEC) if ENDPOINT_SILENCE_SEC else None,
+            min_speech_sec=ENDPOINT_MIN_SPEECH_SEC,
+            no_speech_timeout_sec=NO_SPEECH_TIMEOUT_SEC,
+            initial_floor_db=self.energy_gate.noise_floor.db if self.energy_gate else None,
+            # The pre-roll (end of the wake word) is sent but doesn't count as the command
+            armed_at=time.time(),
+            reseed_sec=NOISE_FLOOR_RESEED_SEC,
+        )
         self.recording = True
-        self.last_speech_time = time.time() # Initialize last speech time
         print("Recording started...")
-        self._close_output_stream()
+        self.player.stop() # Don't talk over the user (and don't record the speaker)
 
+        reader = None
         try:
-            self.audio_stream_input = self.audio_interface.open(format=FORMAT,
-                                                                 channels=CHANNELS,
-                                                                 rate=RATE,
-                                                                 input=True,
-                                                                 frames_per_buffer=FRAMES_PER_BUFFER,
-                                                                 stream_callback=self._audio_callback)
-            self.audio_stream_input.start_stream()
+            self.capture.start()
+            reader = self.capture.reader(preroll_frames=round(RECORDING_PREROLL_SEC * RATE / FRAMES_PER_BUFFER), start=start)
 
             recording_start_time = time.time()
             max_recording_duration = 30 # Keep max duration as a fallback
@@ -342,6 +437,13 @@ class VoiceClient:
             recording_indicator_time = time.time()
 
             while self.recording and not self.stop_event.is_set():
+                try:
+                    audio_data, captured_at = reader.read(timeout=0.5)
+                except CaptureClosed:
+                    print("\nCapture closed, recording stops.")
+                    break
+                if audio_data is not None:
+                    self._process_recorded_frame(audio_data, captured_at)
                 current_time = time.time()
 
                 if current_time - recording_indicator_time >= 0.5:
@@ -354,12 +456,12 @@ class VoiceClient:
                     self.recording = False # Ensure stop if max duration hit
                     break
 
-                time.sleep(0.1)
-
         except Exception as e:
-            print(f"Error starting recording stream: {e}")
+            print(f"Error during recording: {e}")
             self.recording = False
         finally:
+            if reader and reader.dropped:
+                print(f"\nWarning: {reader.dropped} recorded frame(s) were overwritten before they could be sent.")
             if self.recording:
                  self._stop_recording()
             else:
@@ -367,18 +469,25 @@ class VoiceClient:
 
 
     def _stop_recording_internal(self):
-        """Internal part of stopping recording, mainly closing the stream."""
-        print("\nStopping recording stream internally...")
-        if self.audio_stream_input:
+        """Internal part of stopping recording. The capture stream stays open for wake word listening."""
+        print("\nStopping recording internally...")
+        self._flush_upstream()
+
+    def _flush_upstream(self):
+        """Sends the encoder's last partial frame and prints the upload size of the utterance."""
+        encoder, self.encoder = self.encoder, None
+        if encoder is None:
+            return
+        tail = encoder.flush()
+        if tail and self.ws_connected.is_set():
             try:
-                if self.audio_stream_input.is_active():
-                    self.audio_stream_input.stop_stream()
-                self.audio_stream_input.close()
-                print("Input stream closed.")
+                self.ws.send(tail, websocket.ABNF.OPCODE_BINARY)
             except Exception as e:
-                print(f"Error closing input stream: {e}")
-            finally:
-                self.audio_stream_input = None
+                print(f"Error sending final audio frame: {e}")
+        seconds = encoder.bytes_in / (RATE * 2)
+        if seconds > 0:
+            print(f"Uploaded {seconds:.1f}s of audio as {encoder.bytes_out / 1024:.1f} KiB "
+                  f"({encoder.bytes_out * 8 / seconds / 1000:.0f} kbit/s, {encoder.format})")
 
 
     def _stop_recording(self):
@@ -453,11 +562,8 @@ class VoiceClient:
             if self.ws_thread.is_alive():
                 print("Warning: WebSocket thread did not terminate gracefully.")
 
-        if self.audio_stream_input and self.audio_stream_input.is_active():
-            self.audio_stream_input.stop_stream()
-        if self.audio_stream_input:
-            self.audio_stream_input.close()
-        self._close_output_stream()
+        self.capture.close()
+        self.player.close()
 
         self.audio_interface.terminate()
         print("PyAudio terminated.")
@@ -0,0 +1,378 @@
+"""
+Threaded audio playback for the Raspberry Pi client.
+
+The backend forwards the TTS response as binary WebSocket messages followed by
+an `audioEnd` event. The TTS API sends a WAV stream (22.05 kHz for VITS,
+24 kHz for XTTS) whose RIFF/data sizes may be 0xFFFFFFFF because the length is
+unknown while streaming. AudioPlayer:
+
+    parses    the WAV header incrementally (header bytes are never played);
+              data without a RIFF header is taken as raw 16-bit PCM at `pcm_rate`
+    resamples to the output device's rate with NumPy linear interpolation,
+              carrying the phase across chunks so chunk borders don't click
+    buffers   in a ring buffer that the receive thread writes and a dedicated
+              playback thread drains, so receiving never waits for the speaker
+    starts    once `prebuffer_ms` of audio is queued (or the response has
+              ended), and goes back to pre-buffering after an underrun
+"""
+import struct
+import threading
+import time
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+STREAMING_SIZES = (0, 0xFFFFFFFF)  # data chunk sizes used when the length is not known up front
+
+
+def _to_float(raw, bits, float_format, channels):
+    """Interleaved sample bytes to mono float32 in [-1, 1]."""
+    if float_format:
+        samples = np.frombuffer(raw, dtype="<f4" if bits == 32 else "<f8").astype(np.float32)
+    elif bits == 8:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif bits == 16:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif bits == 24:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        samples = np.where(values & 0x800000, values - 0x1000000, values).astype(np.float32) / 8388608.0
+    else:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+class WavStreamParser:
+    """Incremental WAV parser: feed() arbitrary chunks, get mono float32 samples back."""
+
+    def __init__(self, pcm_rate=22050):
+        self.pcm_rate = pcm_rate
+        self.reset()
+
+    def reset(self):
+        self._buffer = b""
+        self._state = "start"
+        self._skip = 0  # bytes of an unused chunk still to discard
+        self._data_left = None  # bytes left in the data chunk, None when unbounded
+        self.rate = None
+        self.channels = 1
+        self.bits = 16
+        self.float_format = False
+        self.has_header = False
+
+    @property
+    def _block_align(self):
+        return self.channels * self.bits // 8
+
+    def feed(self, data):
+        self._buffer += data
+        out = []
+        while True:
+            if self._state == "start":
+                if len(self._buffer) < 12:
+                    break
+                if self._buffer[:4] == b"RIFF" and self._buffer[8:12] == b"WAVE":
+                    self.has_header = True
+                    self._buffer = self._buffer[12:]
+                    self._state = "chunks"
+                else:
+                    # Headerless PCM
+                    self.rate = self.pcm_rate
+                    self._state = "data"
+            elif self._state == "skip":
+                dropped = min(self._skip, len(self._buffer))
+                self._buffer = self._buffer[dropped:]
+                self._skip -= dropped
+                if self._skip:
+                    break
+                self._state = "chunks"
+            elif self._state == "chunks":
+                if len(self._buffer) < 8:
+                    break
+                chunk_id, size = struct.unpack("<4sI", self._buffer[:8])
+                if chunk_id == b"data":
+                    self._buffer = self._buffer[8:]
+                    self._data_left = None if size in STREAMING_SIZES else size
+                    self._state = "data"
+                elif chunk_id == b"fmt ":
+                    if len(self._buffer) < 8 + size:
+                        break
+                    self._parse_fmt(self._buffer[8:8 + size])
+                    self._buffer = self._buffer[8 + size + (size & 1):]
+                else:
+                    # LIST, fact, ... (chunks are padded to an even size)
+                    self._buffer = self._buffer[8:]
+                    self._skip = size + (size & 1)
+                    self._state = "skip"
+            else:  # data
+                available = len(self._buffer)
+                if self._data_left is not None:
+                    available = min(available, self._data_left)
+                usable = available - available % self._block_align
+                if usable:
+                    out.append(_to_float(self._buffer[:usable], self.bits, self.float_format, self.channels))
+                    self._buffer = self._buffer[usable:]
+                    if self._data_left is not None:
+                        self._data_left -= usable
+                if self._data_left == 0:
+                    self._data_left = None
+                    self._state = "chunks"
+                    continue
+                break
+        if not out:
+            return np.zeros(0, dtype=np.float32)
+        return out[0] if len(out) == 1 else np.concatenate(out)
+
+    def _parse_fmt(self, fmt):
+        format_tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+        if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            format_tag = struct.unpack("<H", fmt[24:26])[0]  # First two bytes of the sub-format GUID
+        if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+            raise ValueError(f"Unsupported WAV format tag {format_tag:#x}")
+        self.float_format = format_tag == WAVE_FORMAT_IEEE_FLOAT
+        self.channels = max(1, channels)
+        self.rate = rate
+        self.bits = bits
+
+
+class LinearResampler:
+    """Streaming linear-interpolation resampler (np.interp) that keeps its phase between chunks."""
+
+    def __init__(self, src_rate, dst_rate):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self._step = src_rate / dst_rate
+        self._pos = 0.0  # position of the next output sample, in input samples from `_last`
+        self._last = None
+
+    def process(self, samples):
+        if self.src_rate == self.dst_rate or samples.size == 0:
+            return samples
+        x = samples if self._last is None else np.concatenate(([self._last], samples))
+        end = len(x) - 1
+        count = int((end - self._pos) // self._step) + 1 if end >= self._pos else 0
+        positions = self._pos + self._step * np.arange(count)
+        out = np.interp(positions, np.arange(len(x)), x).astype(np.float32)
+        self._pos += self._step * count - end
+        self._last = x[-1]
+        return out
+
+
+class RingBuffer:
+    """FIFO of int16 samples over a preallocated array; grows if a long response arrives faster than it plays."""
+
+    def __init__(self, capacity):
+        self._data = np.zeros(max(1, int(capacity)), dtype=np.int16)
+        self._start = 0
+        self.size = 0
+
+    def write(self, samples):
+        n = len(samples)
+        if self.size + n > len(self._data):
+            self._grow(self.size + n)
+        capacity = len(self._data)
+        end = (self._start + self.size) % capacity
+        first = min(n, capacity - end)
+        self._data[end:end + first] = samples[:first]
+        self._data[:n - first] = samples[first:]
+        self.size += n
+
+    def read(self, n):
+        n = min(n, self.size)
+        first = min(n, len(self._data) - self._start)
+        out = self._data[self._start:self._start + first]
+        if first < n:
+            out = np.concatenate((out, self._data[:n - first]))
+        else:
+            out = out.copy()
+        self._start = (self._start + n) % len(self._data)
+        self.size -= n
+        return out
+
+    def clear(self):
+        self._start = 0
+        self.size = 0
+
+    def _grow(self, needed):
+        pending = self.read(self.size)
+        self._data = np.zeros(max(needed, 2 * len(self._data)), dtype=np.int16)
+        self._data[:len(pending)] = pending
+        self._start = 0
+        self.size = len(pending)
+
+
+class AudioPlayer:
+    """Plays response audio on its own thread through a PyAudio output stream at the device rate."""
+
+    def __init__(self, audio_interface, device_rate=None, prebuffer_ms=200, period_frames=1024,
+                 pcm_rate=22050, buffer_sec=10, output_device_index=None):
+        self._pa = audio_interface
+        self._device_index = output_device_index
+        if not device_rate:
+            info = (audio_interface.get_device_info_by_index(output_device_index) if output_device_index is not None
+                    else audio_interface.get_default_output_device_info())
+            device_rate = int(info["defaultSampleRate"])
+        self.device_rate = int(device_rate)
+        self.period_frames = period_frames
+        self._prebuffer = int(self.device_rate * prebuffer_ms / 1000)
+
+        self._parser = WavStreamParser(pcm_rate)
+        self._resampler = None
+        self._ring = RingBuffer(self.device_rate * buffer_sec)
+        self._cond = threading.Condition()
+        self._playing = False
+        self._ended = True  # No response in progress
+        # Set when stop() interrupts a response: its remaining chunks are dropped until end_of_stream(),
+        # otherwise the next chunk would start a "new" response in the middle of the WAV data
+        self._discarding = False
+        self._discarded = 0
+        self._closed = False
+        self._stream = None
+        self._thread = None
+
+        # Per-response stats, printed when the response has played out
+        self._first_chunk_time = None
+        self._first_audio_time = None
+        self._response_frames = 0
+        self._underruns = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="playback", daemon=True)
+        self._thread.start()
+
+    def feed(self, data):
+        """Queues a chunk of the current response (the first chunk after end_of_stream() starts a new one)."""
+        with self._cond:
+            if self._discarding:
+                self._discarded += 1
+                return
+            if self._ended:
+                self._parser.reset()
+                self._resampler = None
+                self._ended = False
+                self._first_chunk_time = time.time()
+                self._first_audio_time = None
+                self._response_frames = 0
+                self._underruns = 0
+        try:
+            samples = self._parser.feed(data)
+        except ValueError as e:
+            print(f"Cannot play response audio: {e}")
+            return
+        if samples.size == 0:
+            return
+        if self._resampler is None:
+            self._resampler = LinearResampler(self._parser.rate, self.device_rate)
+            print(f"Playing {'WAV' if self._parser.has_header else 'raw PCM'} at {self._parser.rate} Hz"
+                  f"{f', resampled to {self.device_rate} Hz' if self._parser.rate != self.device_rate else ''}")
+        pcm = (np.clip(self._resampler.process(samples), -1.0, 1.0) * 32767.0).astype(np.int16)
+        with self._cond:
+            if self._discarding:
+                return  # stop() came in while this chunk was being decoded
+            self._ring.write(pcm)
+            self._response_frames += len(pcm)
+            self._cond.notify()
+
+    def end_of_stream(self):
+        """Marks the current response as complete; whatever is buffered plays out even below the pre-buffer."""
+        with self._cond:
+            if self._discarding:
+                print(f"Dropped {self._discarded} chunk(s) of the interrupted response")
+                self._discarding = False
+            self._ended = True
+            self._cond.notify()
+
+    def stop(self):
+        """
+        Drops all queued audio, e.g. when the user starts speaking again. The
+        rest of a response still being received is dropped as well.
+        """
+        with self._cond:
+            if not self._ended:
+                self._discarding = True
+                self._discarded = 0
+            self._ring.clear()
+            self._ended = True
+            self._playing = False
+            self._cond.notify()
+
+    def is_active(self):
+        with self._cond:
+            return not self._ended or self._ring.size > 0
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._ring.clear()
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def _next_block_locked(self):
+        """Returns the next block to play, or None to wait. Called with the condition held."""
+        if not self._playing:
+            if self._ring.size == 0 or (self._ring.size < self._prebuffer and not self._ended):
+                return None
+            self._playing = True
+        if self._ring.size == 0:
+            self._playing = False
+            if not self._ended:
+                self._underruns += 1
+            return None
+        return self._ring.read(self.period_frames)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                block = self._next_block_locked()
+                while block is None and not self._closed:
+                    if self._ended and self._ring.size == 0 and self._stream is not None:
+                        break  # Response finished, close the stream below
+                    self._cond.wait(timeout=0.5)
+                    block = self._next_block_locked()
+                if self._closed:
+                    break
+                if block is not None and self._first_audio_time is None:
+                    self._first_audio_time = time.time()
+
+            try:
+                if block is None:
+                    self._finish_response()
+                    continue
+                if self._stream is None:
+                    self._stream = self._pa.open(format=self._pa.get_format_from_width(2), channels=1,
+                                                 rate=self.device_rate, output=True,
+                                                 frames_per_buffer=self.period_frames,
+                                                 output_device_index=self._device_index)
+                self._stream.write(block.tobytes())
+            except Exception as e:
+                print(f"Error playing audio: {e}")
+                with self._cond:
+                    self._ring.clear()
+                    self._playing = False
+                self._close_stream()
+        self._close_stream()
+
+    def _finish_response(self):
+        # stop_stream() lets the device play out what has already been written
+        self._close_stream()
+        if self._first_chunk_time is not None and self._first_audio_time is not None:
+            start_ms = (self._first_audio_time - self._first_chunk_time) * 1000
+            print(f"Playback finished: {self._response_frames / self.device_rate:.1f}s of audio, "
+                  f"started {start_ms:.0f} ms after the first chunk, {self._underruns} underrun(s)")
+        self._first_chunk_time = None
+
+    def _close_stream(self):
+        if self._stream is None:
+            return
+        try:
+            self._stream.stop_stream()
+            self._stream.close()
+        except Exception as e:
+            print(f"Error closing output stream: {e}")
+        finally:
+            self._stream = None
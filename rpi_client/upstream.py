@@ -0,0 +1,94 @@
+"""
+Upstream audio encoding for the Raspberry Pi client.
+
+Raw 16 kHz s16le PCM costs 256 kbit/s per recording satellite. With Opus the
+client sends 20 ms packets at `bitrate` (24 kbit/s by default, about a tenth).
+Packets are framed with a 2-byte big-endian length so they survive being
+concatenated by the backend; whisper-api splits and decodes them again.
+
+The format is negotiated when the WebSocket connects: the client sends
+`{"event": "hello", "audio": {...}}` and uses whatever format the backend's
+`helloAck` names. Backends that don't answer keep receiving raw PCM.
+"""
+import struct
+
+try:
+    import opuslib
+    OPUS_AVAILABLE = True
+except Exception:  # ImportError, or libopus itself missing
+    OPUS_AVAILABLE = False
+
+PCM_FORMAT = "pcm_s16le"
+OPUS_FORMAT = "opus"
+OPUS_FRAME_MS = 20
+
+
+class PcmEncoder:
+    format = PCM_FORMAT
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def encode(self, pcm):
+        self.bytes_in += len(pcm)
+        self.bytes_out += len(pcm)
+        return pcm
+
+    def flush(self):
+        return b""
+
+
+class OpusEncoder:
+    """Encodes 16-bit mono PCM into length-prefixed Opus packets; keeps partial frames until the next call."""
+
+    format = OPUS_FORMAT
+
+    def __init__(self, rate, bitrate=24000, complexity=5):
+        self._encoder = opuslib.Encoder(rate, 1, opuslib.APPLICATION_VOIP)
+        self._encoder.bitrate = bitrate
+        # Lower complexity trades a little quality for CPU time on the Pi
+        self._encoder.complexity = complexity
+        self._frame_samples = rate * OPUS_FRAME_MS // 1000
+        self._frame_bytes = self._frame_samples * 2
+        self._pending = b""
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def encode(self, pcm):
+        self.bytes_in += len(pcm)
+        data = self._pending + pcm
+        usable = len(data) - len(data) % self._frame_bytes
+        self._pending = data[usable:]
+        return self._packets(data[:usable])
+
+    def flush(self):
+        """Encodes the last partial frame, padded with silence."""
+        if not self._pending:
+            return b""
+        data = self._pending + b"\x00" * (self._frame_bytes - len(self._pending))
+        self._pending = b""
+        return self._packets(data)
+
+    def _packets(self, data):
+        out = []
+        for offset in range(0, len(data), self._frame_bytes):
+            packet = self._encoder.encode(data[offset:offset + self._frame_bytes], self._frame_samples)
+            out.append(struct.pack(">H", len(packet)))
+            out.append(packet)
+        encoded = b"".join(out)
+        self.bytes_out += len(encoded)
+        return encoded
+
+
+def hello_message(requested_format, rate):
+    return {
+        "event": "hello",
+        "audio": {"format": requested_format, "sample_rate": rate, "channels": 1, "frame_ms": OPUS_FRAME_MS},
+    }
+
+
+def create_encoder(negotiated_format, rate, bitrate=24000):
+    if negotiated_format == OPUS_FORMAT and OPUS_AVAILABLE:
+        return OpusEncoder(rate, bitrate)
+    return PcmEncoder()
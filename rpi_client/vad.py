@@ -0,0 +1,220 @@
+"""
+Voice activity helpers for the Raspberry Pi client.
+
+Everything works on 16-bit PCM buffers with vectorized NumPy, so checking a
+1024-frame buffer costs a few microseconds.
+
+EnergyGate sits in front of the wake-word recognizer. It tracks the room's
+noise floor and passes buffers on only while their level is `margin_db`
+above it (plus a hangover), so Vosk does no work in a silent room. Voiced
+buffers don't move the floor, so a noise that starts well above it (a fan,
+a dishwasher) would stay "voiced" for good; after `reseed_frames` voiced
+buffers in a row the floor is reset to the quietest of them. A few
+buffers from before the onset are replayed when the gate opens, so the
+soft start of the wake phrase is not cut off.
+
+Endpointer decides when a recorded command has ended, using the same noise
+floor. A frame is speech when it is `margin_db` above the floor; the
+`hangover` after the last speech frame still counts as speech (soft word
+endings), and the utterance ends after `end_silence` more of silence. Blips
+shorter than `min_speech` in total never arm the endpoint, so a cough does
+not end the recording early. The aggressiveness presets trade margin against
+how quickly the end is declared.
+"""
+from collections import deque
+
+import numpy as np
+
+FULL_SCALE = 32768.0
+# Endpointer floor when neither the wake word gate nor the pre-roll gave a usable one: a quiet room
+FALLBACK_FLOOR_DB = -60.0
+
+# aggressiveness -> (margin_db, hangover_sec, end_silence_sec); the end is declared
+# hangover + end_silence after the last speech frame: 0.55, 0.5, 0.4 and 0.3 s
+ENDPOINT_PRESETS = {
+    0: (6.0, 0.2, 0.35),
+    1: (8.0, 0.15, 0.35),
+    2: (10.0, 0.1, 0.3),
+    3: (12.0, 0.1, 0.2),
+}
+
+
+def level_dbfs(pcm):
+    """RMS level of a 16-bit PCM buffer in dBFS (-100 for digital silence)."""
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+    if samples.size == 0:
+        return -100.0
+    rms = np.sqrt(np.mean(samples * samples)) / FULL_SCALE
+    return float(20.0 * np.log10(max(rms, 1e-5)))
+
+
+class NoiseFloor:
+    """
+    Running estimate of the background level: follows drops quickly and rises
+    slowly. Voiced levels are only tracked for re-seeding after `reseed_frames`
+    of them in a row.
+    """
+
+    def __init__(self, fall=0.1, rise=0.005, initial_db=None, reseed_frames=None):
+        self.fall = fall
+        self.rise = rise
+        self.db = initial_db
+        self.reseed_frames = reseed_frames
+        self.reseeds = 0
+        self._voiced_run = 0
+        self._voiced_min = None
+
+    def update(self, level_db, voiced=False):
+        if voiced:
+            self._voiced_run += 1
+            self._voiced_min = level_db if self._voiced_min is None else min(self._voiced_min, level_db)
+            if self.reseed_frames and self._voiced_run >= self.reseed_frames:
+                # Too long for speech: this is the new background
+                self.db = self._voiced_min
+                self.reseeds += 1
+                self._voiced_run, self._voiced_min = 0, None
+            return self.db
+        self._voiced_run, self._voiced_min = 0, None
+        if self.db is None:
+            self.db = level_db
+        else:
+            rate = self.fall if level_db < self.db else self.rise
+            self.db += rate * (level_db - self.db)
+        return self.db
+
+
+class EnergyGate:
+    """Passes audio on only around frames that stand out from the noise floor."""
+
+    def __init__(self, margin_db=9.0, min_level_db=-55.0, hangover_frames=8, preroll_frames=3, reseed_frames=None):
+        self.margin_db = margin_db
+        self.min_level_db = min_level_db
+        self.hangover_frames = hangover_frames
+        self.noise_floor = NoiseFloor(reseed_frames=reseed_frames)
+        self._preroll = deque(maxlen=preroll_frames)
+        self._hangover = 0
+        self.is_open = False
+        self.opened_at = None  # time of the current onset, set by process()
+
+        # Stats
+        self.frames = 0
+        self.passed = 0
+
+    def is_voiced(self, level_db):
+        return level_db >= self.min_level_db and level_db >= self.noise_floor.db + self.margin_db
+
+    def process(self, pcm, now=None):
+        """
+        Feeds one buffer; returns the list of buffers to pass on (empty while
+        the gate is closed, the pre-roll plus this buffer when it opens).
+        """
+        level_db = level_dbfs(pcm)
+        if self.noise_floor.db is None:
+            self.noise_floor.update(level_db)
+        voiced = self.is_voiced(level_db)
+        # Speech must not pull the floor up, only the background (or a voiced stretch too long for speech) may
+        self.noise_floor.update(level_db, voiced)
+
+        self.frames += 1
+        if voiced:
+            self._hangover = self.hangover_frames
+        elif self._hangover > 0:
+            self._hangover -= 1
+        else:
+            self.is_open = False
+            self._preroll.append(pcm)
+            return []
+
+        if self.is_open:
+            self.passed += 1
+            return [pcm]
+        self.is_open = True
+        self.opened_at = now
+        buffers = list(self._preroll) + [pcm]
+        self._preroll.clear()
+        self.passed += len(buffers)
+        return buffers
+
+    def pass_ratio(self):
+        return self.passed / self.frames if self.frames else 0.0
+
+
+class Endpointer:
+    """Detects the end of an utterance in a stream of equally sized buffers."""
+
+    def __init__(self, frame_sec, aggressiveness=2, end_silence_sec=None, min_speech_sec=0.25,
+                 no_speech_timeout_sec=3.0, min_level_db=-55.0, initial_floor_db=None, armed_at=None,
+                 reseed_sec=None):
+        margin_db, hangover_sec, preset_silence_sec = ENDPOINT_PRESETS[aggressiveness]
+        self.aggressiveness = aggressiveness
+        self.frame_sec = frame_sec
+        self.margin_db = margin_db
+        self.min_level_db = min_level_db
+        self.hangover_sec = hangover_sec
+        self.end_silence_sec = preset_silence_sec if end_silence_sec is None else end_silence_sec
+        self.min_speech_sec = min_speech_sec
+        self.no_speech_timeout_sec = no_speech_timeout_sec
+        # Without a floor from the gate, only quiet pre-roll buffers may seed it (the
+        # pre-roll mostly holds the wake word); otherwise FALLBACK_FLOOR_DB is used
+        self.noise_floor = NoiseFloor(initial_db=initial_floor_db,
+                                      reseed_frames=round(reseed_sec / frame_sec) if reseed_sec else None)
+        # Buffers captured before this time (e.g. a pre-roll holding the end of the
+        # wake word) update the floor but don't count as speech
+        self.armed_at = armed_at
+
+        self.started_at = None  # time of the first armed buffer
+        self.speech_sec = 0.0
+        self.speech_started_at = None  # first speech buffer
+        self.last_speech_at = None  # end of the last speech buffer
+        self._silent_frames = 0
+        self.decided_at = None
+
+    def process(self, pcm, now):
+        """
+        Feeds one buffer captured at `now`. Returns None while the utterance
+        continues, "end" once it has ended and "no_speech" if nothing was said.
+        """
+        level_db = level_dbfs(pcm)
+        armed = self.armed_at is None or now >= self.armed_at
+        if self.noise_floor.db is None:
+            if armed:
+                self.noise_floor.db = FALLBACK_FLOOR_DB
+            elif level_db < self.min_level_db + self.margin_db:
+                self.noise_floor.update(level_db)
+            else:
+                return None  # Loud pre-roll buffer: neither a floor nor part of the command
+        voiced = level_db >= self.min_level_db and level_db >= self.noise_floor.db + self.margin_db
+        in_hangover = not voiced and self._silent_frames * self.frame_sec < self.hangover_sec
+        if voiced:
+            self._silent_frames = 0
+            self.noise_floor.update(level_db, voiced=True)
+        else:
+            self._silent_frames += 1
+            if not in_hangover:
+                self.noise_floor.update(level_db)
+
+        if not armed:
+            return None
+        if self.started_at is None:
+            self.started_at = now
+        if voiced:
+            if self.speech_started_at is None:
+                self.speech_started_at = now
+            self.speech_sec += self.frame_sec
+            self.last_speech_at = now
+
+        if self.speech_sec < self.min_speech_sec:
+            if now - self.started_at >= self.no_speech_timeout_sec:
+                self.decided_at = now
+                return "no_speech"
+            return None
+        if self._silent_frames * self.frame_sec >= self.hangover_sec + self.end_silence_sec:
+            self.decided_at = now
+            return "end"
+        return None
+
+    def decision_delay(self):
+        """Seconds of audio between the last speech buffer and the end decision."""
+        if self.decided_at is None or self.last_speech_at is None:
+            return None
+        return self.decided_at - self.last_speech_at
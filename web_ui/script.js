@@ -25,6 +25,7 @@ let analyserNode; // For silence detection
 let scriptProcessorNode; // For silence detection
 let sourceNode; // For silence detection input
 let audioQueue = []; // Buffer for decoded audio chunks ready for playback
+let responseAudioChunks = []; // Chunks of the response being received, played on audioEnd
 let playbackSourceNode; // The currently playing audio source (renamed from sourceNode)
 let isPlaying = false;
 let isRecording = false;
@@ -61,14 +62,17 @@ function connectWebSocket() {
         };        websocket.onmessage = (event) => {
             // Handle incoming messages (primarily audio data)
             if (event.data instanceof Blob) {
-                // Received complete audio file - play it directly
-                console.log(`Received complete audio blob size: ${event.data.size}`);
-                playStreamingAudio(event.data);
+                // The backend forwards the response in chunks; decodeAudioData needs the whole file
+                console.log(`Received audio chunk size: ${event.data.size}`);
+                responseAudioChunks.push(event.data);
             } else {
                 // Handle text messages (e.g., errors, status updates from backend)
                 console.log('Received text message:', event.data);
                 try {
                     const msgData = JSON.parse(event.data);
+                    if (msgData.type === 'error') {
+                        responseAudioChunks = []; // The response was cut off, don't play a partial file
+                    }
                     if (msgData.error) {
                         updateStatus(`Server Error: ${msgData.error}`, true);
                     } else if (msgData.event === 'noSpeechDetected') {
@@ -83,8 +87,12 @@ function connectWebSocket() {
                         updateStatus('Received text response (TTS failed).');
                         responseDiv.textContent = msgData.text;
                     } else if (msgData.event === 'audioEnd') {
-                        // Audio stream complete signal (for reference, audio already processed)
+                        // Audio stream complete: play the collected chunks as one file
                         console.log('Audio stream complete signal received');
+                        if (responseAudioChunks.length > 0) {
+                            playStreamingAudio(new Blob(responseAudioChunks));
+                            responseAudioChunks = [];
+                        }
                     }
                     // Handle other potential text messages
                 } catch (e) {
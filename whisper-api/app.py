@@ -1,72 +1,364 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
 import os
+import json
 import whisper
 import tempfile
+import time
+
+import audio_io
+import chunking
+import engines
+import metrics
+import result_cache
+from batching import BatchScheduler
+import vad
+from language_cache import LanguageCache
+from streaming import StreamingTranscriber
 
 app = Flask(__name__)
+sock = Sock(app)
 
 # Load the Whisper model
 # Use environment variable ASR_MODEL, default to "base"
 model_name = os.environ.get("ASR_MODEL", "base")
+# Inference engine: "openai" (openai-whisper, default) or "ctranslate2" (faster-whisper, int8)
+engine_name = os.environ.get("WHISPER_ENGINE", "openai")
 whisper_language = os.environ.get("WHISPER_LANGUAGE", "auto")
-print(f"Loading Whisper model: {model_name}...")
+# Streaming endpoint: decode every STEP seconds, slide the window beyond WINDOW seconds
+stream_step_sec = float(os.environ.get("WHISPER_STREAM_STEP_SEC", "1.0"))
+stream_window_sec = float(os.environ.get("WHISPER_STREAM_WINDOW_SEC", "15.0"))
+# Micro-batching of concurrent /transcribe requests (clips up to 30 s)
+batching_enabled = os.environ.get("WHISPER_BATCHING", "false").lower() == "true"
+batch_window_ms = float(os.environ.get("WHISPER_BATCH_WINDOW_MS", "50"))
+batch_max_size = int(os.environ.get("WHISPER_BATCH_MAX_SIZE", "8"))
+# Long recordings are split on silence and the chunks decoded as batches
+long_audio_sec = float(os.environ.get("WHISPER_LONG_AUDIO_SEC", "30"))
+long_audio_chunk_sec = min(float(os.environ.get("WHISPER_LONG_AUDIO_CHUNK_SEC", "30")), 30.0)
+long_audio_batch_size = int(os.environ.get("WHISPER_LONG_AUDIO_BATCH_SIZE", "4"))
+# Per-client language cache (only used with WHISPER_LANGUAGE=auto)
+language_cache_enabled = os.environ.get("WHISPER_LANG_CACHE", "true").lower() == "true"
+language_cache_size = int(os.environ.get("WHISPER_LANG_CACHE_SIZE", "256"))
+language_cache_half_life_sec = float(os.environ.get("WHISPER_LANG_CACHE_HALF_LIFE_SEC", "21600"))
+language_cache_min_confidence = float(os.environ.get("WHISPER_LANG_CACHE_MIN_CONFIDENCE", "0.8"))
+language_cache_min_logprob = float(os.environ.get("WHISPER_LANG_CACHE_MIN_LOGPROB", "-1.0"))
+# Voice-activity trimming of leading/trailing silence before decoding
+vad_enabled = os.environ.get("WHISPER_VAD", "true").lower() == "true"
+vad_margin_db = float(os.environ.get("WHISPER_VAD_MARGIN_DB", "12"))
+vad_floor_dbfs = float(os.environ.get("WHISPER_VAD_FLOOR_DBFS", "-50"))
+vad_min_speech_ms = int(os.environ.get("WHISPER_VAD_MIN_SPEECH_MS", "200"))
+vad_padding_ms = int(os.environ.get("WHISPER_VAD_PADDING_MS", "250"))
+# Content-addressed result cache (memory LRU, optional shared disk tier)
+result_cache_mb = float(os.environ.get("WHISPER_RESULT_CACHE_MB", "64"))
+result_cache_dir = os.environ.get("WHISPER_RESULT_CACHE_DIR", "")
+result_cache_disk_mb = float(os.environ.get("WHISPER_RESULT_CACHE_DISK_MB", "512"))
+print(f"Loading Whisper model: {model_name} (engine: {engine_name})...")
 print(f"Whisper language setting: {whisper_language}")
 try:
-    model = whisper.load_model(model_name)
-    print(f"Whisper model '{model_name}' loaded successfully.")
+    # Set by gunicorn.conf.py: the workers are forked from this process after the import
+    engine = engines.create_engine(engine_name, model_name, forking=os.environ.get("WHISPER_PREFORK") == "1")
+    if engine.is_loaded():
+        print(f"Whisper model '{model_name}' loaded successfully ({engine.compute_type} on {engine.device}, {engine.load_seconds:.1f}s).")
+    else:
+        print(f"Whisper model '{model_name}' will be loaded in each worker after the fork.")
 except Exception as e:
     print(f"Error loading Whisper model '{model_name}': {e}")
     # Exit if model loading fails? Or handle gracefully? For now, print error.
-    model = None # Indicate model failed to load
+    engine = None # Indicate model failed to load
+else:
+    if engine.load_seconds is not None:
+        metrics.MODEL_LOAD_SECONDS.set(engine.load_seconds)
+
+def load_worker_model():
+    """Called from gunicorn's post_fork: loads models that cannot be shared across fork()."""
+    if engine is None or engine.is_loaded():
+        return
+    try:
+        engine.ensure_loaded()
+        metrics.MODEL_LOAD_SECONDS.set(engine.load_seconds)
+        print(f"Whisper model '{model_name}' loaded in worker {os.getpid()} ({engine.load_seconds:.1f}s).")
+    except Exception as e:
+        # The worker stays up and retries on its first request
+        print(f"Error loading Whisper model '{model_name}' in worker {os.getpid()}: {e}")
+
+def build_transcribe_options():
+    """Returns the model.transcribe options derived from the language setting."""
+    transcribe_options = {"verbose": False}
+
+    # Set language if specified (not 'auto')
+    if whisper_language and whisper_language.lower() != 'auto':
+        transcribe_options["language"] = whisper_language
+    return transcribe_options
+
+def load_request_audio():
+    """
+    Reads the uploaded audio into a float32 array.
+    Declared raw PCM and 16 kHz PCM WAV are decoded in memory; everything else
+    is written to a temporary file and decoded by ffmpeg via whisper.load_audio.
+    Raises ValueError if the request carries no usable audio.
+    """
+    with metrics.stage("upload"):
+        if 'file' in request.files:
+            data = request.files['file'].read()
+        else:
+            # Also accept the audio as the raw request body
+            data = request.get_data()
+    if not data:
+        raise ValueError("No audio file provided")
+
+    declared_format = (request.form.get("format") or request.headers.get("X-Audio-Format") or "").lower()
+    if not declared_format and request.mimetype in audio_io.RAW_PCM_CONTENT_TYPES:
+        declared_format = "pcm_s16le"
+    sample_rate = int(request.form.get("sample_rate") or request.headers.get("X-Audio-Sample-Rate") or audio_io.SAMPLE_RATE)
+    channels = int(request.form.get("channels") or request.headers.get("X-Audio-Channels") or 1)
+
+    with metrics.stage("audio_decode"):
+        audio = audio_io.decode_in_memory(data, declared_format, sample_rate, channels)
+        if audio is not None:
+            print(f"Decoded {len(audio) / audio_io.SAMPLE_RATE:.2f}s of audio in memory")
+            return audio
+
+        # Fallback for arbitrary containers: let ffmpeg decode from a temporary file
+        with tempfile.NamedTemporaryFile(delete=False) as temp_audio:
+            temp_audio.write(data)
+            temp_audio_path = temp_audio.name
+        print(f"Audio saved temporarily to: {temp_audio_path}")
+        try:
+            return whisper.load_audio(temp_audio_path)
+        finally:
+            os.remove(temp_audio_path)
+            print(f"Temporary file removed: {temp_audio_path}")
+
+batch_scheduler = None
+if batching_enabled and engine is not None and engine.supports_batching:
+    batch_scheduler = BatchScheduler(engine.transcribe_batch, window_ms=batch_window_ms, max_batch_size=batch_max_size)
+    print(f"Micro-batching enabled (window {batch_window_ms} ms, max batch size {batch_max_size})")
+    metrics.register_gauge_callback("whisper_batch_queue_depth", "Requests waiting for the batch scheduler.",
+                                    lambda: batch_scheduler.stats()["queue_depth"])
+    metrics.register_gauge_callback("whisper_batch_avg_size", "Average number of requests per batch.",
+                                    lambda: batch_scheduler.stats()["avg_batch_size"])
+elif batching_enabled:
+    print(f"Micro-batching is not supported by the '{engine_name}' engine, disabled")
+
+def run_transcription(audio, options):
+    """Routes a transcription through the batch scheduler when possible."""
+    if batch_scheduler is not None and len(audio) <= engines.CHUNK_SAMPLES:
+        return batch_scheduler.submit((audio, options))
+    return engine.transcribe(audio, **options)
+
+def transcribe_chunk_batch(items):
+    """
+    Transcribes a group of (chunk, options) items of at most 30 s. They go to
+    the model as one batch (through the scheduler when batching is on, so its
+    thread stays the only one using the model); engines without batching
+    transcribe them one after another.
+    """
+    if batch_scheduler is not None:
+        return batch_scheduler.submit_many(items)
+    if engine.supports_batching:
+        return engine.transcribe_batch(items)
+    return [engine.transcribe(chunk, **chunk_options) for chunk, chunk_options in items]
+
+def transcribe_any(audio, options):
+    """Transcribes short clips directly and long recordings as batched chunks."""
+    if len(audio) <= long_audio_sec * audio_io.SAMPLE_RATE:
+        return run_transcription(audio, options)
+
+    if "language" not in options:
+        # Detect once so all chunks are decoded in the same language
+        with metrics.stage("language_detection"):
+            language, _ = engine.detect_language(audio)
+        options = dict(options, language=language)
+    result = chunking.transcribe_chunks(
+        audio,
+        options,
+        transcribe_chunk_batch,
+        batch_size=long_audio_batch_size,
+        max_chunk_sec=long_audio_chunk_sec,
+        min_chunk_sec=long_audio_chunk_sec / 2,
+    )
+    print(f"Long audio ({len(audio) / audio_io.SAMPLE_RATE:.1f}s) transcribed in {result['chunks']} chunks")
+    return result
+
+transcription_cache = None
+if result_cache_mb > 0:
+    transcription_cache = result_cache.TranscriptionCache(
+        max_bytes=result_cache_mb * 2**20,
+        disk_dir=result_cache_dir,
+        disk_max_bytes=result_cache_disk_mb * 2**20,
+    )
+RESULT_CACHE_LOOKUPS = metrics.register(metrics.Counter(
+    "whisper_result_cache_lookups_total", "Transcription cache lookups by result.", labelnames=("result",)))
+
+def transcription_cache_key(audio, client_key=None):
+    """Cache key over the decoded PCM and every setting that changes the result."""
+    # With the language cache, a client's cached language is what the engine decodes with
+    language = whisper_language
+    if language_cache is not None and client_key:
+        language = language_cache.peek(client_key) or whisper_language
+    return result_cache.make_key(audio, {
+        "engine": engine.name,
+        "model": model_name,
+        "compute_type": engine.compute_type,
+        "language": language,
+        "batching": batch_scheduler is not None,
+        "vad": [vad_margin_db, vad_floor_dbfs, vad_min_speech_ms, vad_padding_ms] if vad_enabled else None,
+        "long_audio": [long_audio_sec, long_audio_chunk_sec],
+    })
+
+language_cache = None
+if language_cache_enabled and whisper_language.lower() == 'auto':
+    language_cache = LanguageCache(
+        max_entries=language_cache_size,
+        half_life_sec=language_cache_half_life_sec,
+        min_confidence=language_cache_min_confidence,
+    )
+    metrics.register_gauge_callback("whisper_language_cache_detections_saved",
+                                    "Language detection passes skipped thanks to the language cache.",
+                                    lambda: language_cache.stats()["detections_saved"])
+
+def average_logprob(result):
+    """Duration-weighted average token log probability of a transcription result."""
+    if "avg_logprob" in result:
+        return result["avg_logprob"]
+    segments = result.get("segments") or []
+    total = sum(max(segment["end"] - segment["start"], 0.0) for segment in segments)
+    if total <= 0:
+        return 0.0
+    return sum(segment["avg_logprob"] * max(segment["end"] - segment["start"], 0.0) for segment in segments) / total
+
+def transcribe_for_client(audio, options, client_key):
+    """
+    Transcribes with the client's cached language when possible.
+    Returns (result, cache_status) where cache_status is None (cache not used),
+    "hit", "miss" or "fallback" (cached language decoded poorly, detected again).
+    """
+    if language_cache is None or not client_key or "language" in options:
+        return transcribe_any(audio, options), None
+
+    cached_language = language_cache.lookup(client_key)
+    if cached_language is not None:
+        result = transcribe_any(audio, dict(options, language=cached_language))
+        if average_logprob(result) >= language_cache_min_logprob:
+            language_cache.confirm(client_key)
+            return result, "hit"
+        print(f"Cached language '{cached_language}' scored poorly for client {client_key}, detecting again")
+        language_cache.reject(client_key)
+        status = "fallback"
+    else:
+        status = "miss"
+
+    with metrics.stage("language_detection"):
+        language, confidence = engine.detect_language(audio)
+    language_cache.update(client_key, language, confidence)
+    print(f"Detected language '{language}' (p={confidence:.2f}) for client {client_key}")
+    return transcribe_any(audio, dict(options, language=language)), status
 
 @app.route('/transcribe', methods=['POST'])
 def transcribe_audio():
     """
     Endpoint to receive audio data and return transcription.
-    Expects audio file in the request's 'file' field.
+    Expects audio file in the request's 'file' field or as the request body.
+    Raw 16 kHz mono s16le PCM can be declared with a 'format' field of
+    'pcm_s16le' (or an X-Audio-Format header / audio/L16 content type), and
+    length-prefixed Opus packets with 'opus'.
+    An optional 'client_id' field (or X-Client-Id header) enables the
+    per-client language cache.
     """
-    if model is None:
-         return jsonify({"error": f"Whisper model '{model_name}' not loaded"}), 500
+    started = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+    try:
+        with metrics.trace():
+            response, status_code, audio_sec = handle_transcription()
+    finally:
+        metrics.IN_FLIGHT.dec()
+
+    elapsed = time.perf_counter() - started
+    metrics.REQUEST_SECONDS.observe(elapsed)
+    metrics.REQUESTS.inc(status="ok" if status_code == 200 else "error")
+    if audio_sec:
+        metrics.AUDIO_SECONDS.inc(audio_sec)
+        metrics.REAL_TIME_FACTOR.observe(elapsed / audio_sec)
+    return jsonify(response), status_code
 
-    if 'file' not in request.files:
-        return jsonify({"error": "No audio file provided"}), 400
+def handle_transcription():
+    """Runs one /transcribe request. Returns (response, status_code, audio_seconds)."""
+    if engine is None:
+         return {"error": f"Whisper model '{model_name}' not loaded"}, 500, None
 
-    audio_file = request.files['file']    # Save the audio file temporarily
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
-            audio_file.save(temp_audio.name)
-            temp_audio_path = temp_audio.name
+        audio = load_request_audio()
+    except ValueError as e:
+        return {"error": str(e)}, 400, None
+    except Exception as e:
+        print(f"Error decoding audio: {e}")
+        return {"error": f"Audio decoding failed: {e}"}, 500, None
 
-        print(f"Audio saved temporarily to: {temp_audio_path}")
+    audio_sec = len(audio) / audio_io.SAMPLE_RATE
+    client_key = request.form.get("client_id") or request.headers.get("X-Client-Id")
+    cache_key = None
+    if transcription_cache is not None:
+        cache_key = transcription_cache_key(audio, client_key)
+        cached = transcription_cache.get(cache_key)
+        RESULT_CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+        if cached is not None:
+            print(f"Transcription cache hit: {cached['text']}")
+            # The language cache played no part in answering this request
+            return dict(cached, cached=True, language_cache="bypassed"), 200, audio_sec
+
+    vad_info = None
+    if vad_enabled:
+        with metrics.stage("vad"):
+            audio, vad_info = vad.trim_silence(
+                audio,
+                margin_db=vad_margin_db,
+                floor_dbfs=vad_floor_dbfs,
+                min_speech_ms=vad_min_speech_ms,
+                padding_ms=vad_padding_ms,
+            )
+        if audio is None:
+            print(f"No speech detected in {vad_info['input_sec']}s of audio, skipping transcription")
+            response = {"text": "", "vad": vad_info}
+            if cache_key is not None:
+                transcription_cache.put(cache_key, response)
+            return response, 200, audio_sec
+        print(f"VAD trimmed {vad_info['trimmed_sec']}s of silence ({vad_info['output_sec']}s left)")
 
-        # Transcribe the audio file with language specification
-        transcribe_options = {"verbose": False}
-        
-        # Set language if specified (not 'auto')
-        if whisper_language and whisper_language.lower() != 'auto':
-            transcribe_options["language"] = whisper_language
+    try:
+        # Transcribe the audio with language specification
+        transcribe_options = build_transcribe_options()
+        if "language" in transcribe_options:
             print(f"Using specified language: {whisper_language}")
         else:
             print("Using automatic language detection")
-            
-        result = model.transcribe(temp_audio_path, **transcribe_options)
+
+        result, language_cache_status = transcribe_for_client(audio, transcribe_options, client_key)
         transcription = result["text"]
         detected_language = result.get("language", "unknown")
 
         print(f"Transcription result: {transcription}")
-        print(f"Detected language: {detected_language}")
+        print(f"Detected language: {detected_language} (language cache: {language_cache_status})")
 
     except Exception as e:
         print(f"Error during transcription: {e}")
-        return jsonify({"error": f"Transcription failed: {e}"}), 500
-    finally:
-    # Clean up the temporary file
-        if 'temp_audio_path' in locals() and os.path.exists(temp_audio_path):
-            os.remove(temp_audio_path)
-            print(f"Temporary file removed: {temp_audio_path}")
+        return {"error": f"Transcription failed: {e}"}, 500, audio_sec
 
     # Return in the format expected by the backend
-    return jsonify({"text": transcription})
+    response = {"text": transcription, "vad": vad_info, "language_cache": language_cache_status}
+    if "chunks" in result:
+        # Long recordings also get the stitched, timestamped segments
+        response["chunks"] = result["chunks"]
+        response["segments"] = result["segments"]
+    if cache_key is not None:
+        # language_cache describes this request only, so it is not stored
+        transcription_cache.put(cache_key, {k: v for k, v in response.items() if k != "language_cache"})
+    return response, 200, audio_sec
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics (per worker process)."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -74,9 +366,63 @@ def health_check():
     return jsonify({
         "status": "ok", 
         "model": model_name,
-        "language": whisper_language
+        "language": whisper_language,
+        "batching": batch_scheduler.stats() if batch_scheduler else None,
+        "language_cache": language_cache.stats() if language_cache else None,
+        "result_cache": transcription_cache.stats() if transcription_cache else None,
+        "engine": engine.info() if engine else None,
+        "worker_pid": os.getpid()
     }), 200
 
+@sock.route('/stream')
+def stream_transcription(ws):
+    """
+    WebSocket endpoint for incremental transcription.
+    Expects binary messages with 16 kHz mono s16le PCM frames and a final
+    text message {"event": "audioEnd"}. Sends {"event": "partial", "stable": ...,
+    "unstable": ...} after each decode step and {"text": ...} when the stream ends.
+    """
+    if engine is None:
+        ws.send(json.dumps({"error": f"Whisper model '{model_name}' not loaded"}))
+        return
+
+    transcriber = StreamingTranscriber(
+        engine.transcribe,
+        build_transcribe_options(),
+        step_sec=stream_step_sec,
+        max_window_sec=stream_window_sec,
+    )
+    print("Streaming transcription session started")
+
+    try:
+        while True:
+            message = ws.receive()
+            if isinstance(message, (bytes, bytearray)):
+                partial = transcriber.feed(bytes(message))
+                if partial is not None:
+                    ws.send(json.dumps(partial))
+                continue
+
+            try:
+                command = json.loads(message)
+            except (TypeError, json.JSONDecodeError):
+                ws.send(json.dumps({"error": f"Invalid control message: {message}"}))
+                continue
+
+            if command.get("event") == "audioEnd":
+                transcription = transcriber.finish()
+                print(f"Streaming transcription result ({transcriber.decode_steps} decode steps): {transcription}")
+                ws.send(json.dumps({"text": transcription}))
+                break
+    except ConnectionClosed:
+        print("Streaming client disconnected before audioEnd")
+    except Exception as e:
+        print(f"Error during streaming transcription: {e}")
+        try:
+            ws.send(json.dumps({"error": f"Transcription failed: {e}"}))
+        except ConnectionClosed:
+            pass
+
 # Add an alias endpoint for compatibility
 @app.route('/inference', methods=['POST'])
 def inference_alias():
@@ -84,5 +430,7 @@ def inference_alias():
     return transcribe_audio()
 
 if __name__ == '__main__':
+    # Development server (single process). The container runs gunicorn with
+    # gunicorn.conf.py instead, which forks workers after the model is loaded.
     # Listen on all network interfaces, port 9000
     app.run(host='0.0.0.0', port=9000, debug=False) # Disable debug for production
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+Audio helpers for the Whisper API.
+
+Whisper expects 16 kHz mono float32 samples in the range [-1, 1]. The clients
+and the backend send 16 kHz mono signed 16-bit little-endian PCM, so for those
+inputs the conversion is a single vectorized cast done in memory. Clients
+that negotiated Opus upstream send length-prefixed Opus packets, which are
+decoded with opuslib. Anything else (MP3, Ogg, other sample rates, ...)
+returns None and is left to the ffmpeg-based loader.
+"""
+import io
+import struct
+import wave
+
+import numpy as np
+
+try:
+    import opuslib
+except Exception:  # ImportError, or libopus itself missing
+    opuslib = None
+
+SAMPLE_RATE = 16000  # Whisper's native sample rate
+BYTES_PER_SAMPLE = 2  # s16le
+
+# Values accepted in the `format` field / X-Audio-Format header for headerless PCM
+RAW_PCM_FORMATS = {"pcm_s16le", "s16le", "pcm", "raw"}
+# Content types that declare headerless 16-bit PCM without a format field
+RAW_PCM_CONTENT_TYPES = {"audio/l16", "audio/pcm", "audio/x-raw"}
+# Value of the `format` field for a stream of Opus packets, each preceded by its
+# length as a 2-byte big-endian integer (the framing used by the RPi client)
+OPUS_FORMAT = "opus"
+OPUS_MAX_FRAME_SAMPLES = 1920  # 120 ms at 16 kHz, the longest Opus frame
+
+
+def pcm16_to_float32(data):
+    """Converts raw s16le PCM bytes into a float32 NumPy array in [-1, 1]."""
+    usable = len(data) - (len(data) % BYTES_PER_SAMPLE)
+    return np.frombuffer(data, dtype="<i2", count=usable // BYTES_PER_SAMPLE).astype(np.float32) / 32768.0
+
+
+def _downmix(samples, channels):
+    if channels == 1:
+        return samples
+    usable = len(samples) - (len(samples) % channels)
+    return samples[:usable].reshape(-1, channels).mean(axis=1, dtype=np.float32)
+
+
+def parse_wav(data):
+    """
+    Decodes a 16-bit PCM WAV at 16 kHz into float32 samples.
+    Returns None for any WAV that would need resampling or a codec.
+    """
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            if (wav_file.getcomptype() != "NONE"
+                    or wav_file.getsampwidth() != BYTES_PER_SAMPLE
+                    or wav_file.getframerate() != SAMPLE_RATE):
+                return None
+            channels = wav_file.getnchannels()
+            frames = wav_file.readframes(wav_file.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    return _downmix(pcm16_to_float32(frames), channels)
+
+
+def decode_opus(data, channels=1):
+    """
+    Decodes length-prefixed Opus packets into 16 kHz float32 samples. The
+    decoder runs at Whisper's rate directly, whatever rate the encoder used.
+    """
+    if opuslib is None:
+        raise ValueError("Opus input requires the opuslib package and libopus")
+    decoder = opuslib.Decoder(SAMPLE_RATE, channels)
+    pcm = []
+    offset = 0
+    while offset + 2 <= len(data):
+        (size,) = struct.unpack_from(">H", data, offset)
+        offset += 2
+        if offset + size > len(data):
+            raise ValueError("Truncated Opus packet")
+        try:
+            pcm.append(decoder.decode(bytes(data[offset:offset + size]), OPUS_MAX_FRAME_SAMPLES))
+        except opuslib.OpusError as e:
+            raise ValueError(f"Invalid Opus packet: {e}") from e
+        offset += size
+    return _downmix(pcm16_to_float32(b"".join(pcm)), channels)
+
+
+def decode_in_memory(data, declared_format=None, sample_rate=SAMPLE_RATE, channels=1):
+    """
+    Decodes request bytes without touching the disk.
+
+    Headerless PCM is only recognised when the caller declares it, since raw
+    bytes cannot be told apart from an unknown container. Raises ValueError for
+    declared PCM that Whisper cannot take as-is.
+    """
+    if declared_format == OPUS_FORMAT:
+        return decode_opus(data, channels)
+    if declared_format in RAW_PCM_FORMATS:
+        if sample_rate != SAMPLE_RATE:
+            raise ValueError(f"Raw PCM must be {SAMPLE_RATE} Hz, got {sample_rate} Hz")
+        return _downmix(pcm16_to_float32(data), channels)
+    return parse_wav(data)
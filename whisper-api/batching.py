@@ -0,0 +1,126 @@
+"""
+Dynamic micro-batching for the Whisper API.
+
+Requests that arrive within `window_ms` of the first queued request are
+collected, up to `max_batch_size`, and handed to `batch_fn` as one list. The
+batch function returns one result per item, which is passed back to the
+waiting caller. The worker thread is started lazily in the process that first
+submits work, so the scheduler survives being created before a fork.
+"""
+import os
+import queue
+import threading
+import time
+
+
+class _Job:
+    __slots__ = ("item", "done", "result", "error", "enqueued_at")
+
+    def __init__(self, item):
+        self.item = item
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.enqueued_at = time.monotonic()
+
+
+class BatchScheduler:
+    """Collects concurrent requests into batches for a single model worker thread."""
+
+    def __init__(self, batch_fn, window_ms=50, max_batch_size=8):
+        self._batch_fn = batch_fn
+        self._window = window_ms / 1000.0
+        self._max_batch_size = max(1, int(max_batch_size))
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        # Stats
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+        self._size_counts = {}
+        self._total_wait = 0.0
+
+    def submit(self, item):
+        """Queues an item and blocks until its batch has been processed."""
+        self._ensure_worker()
+        job = _Job(item)
+        self._queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def submit_many(self, items):
+        """Queues several items at once (so they can share a batch) and blocks until all are processed."""
+        self._ensure_worker()
+        jobs = [_Job(item) for item in items]
+        for job in jobs:
+            self._queue.put(job)
+        for job in jobs:
+            job.done.wait()
+        for job in jobs:
+            if job.error is not None:
+                raise job.error
+        return [job.result for job in jobs]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "window_ms": self._window * 1000.0,
+                "max_batch_size": self._max_batch_size,
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "max_observed_batch_size": self._max_seen,
+                "batch_size_counts": {str(size): count for size, count in sorted(self._size_counts.items())},
+                "avg_queue_wait_ms": round(self._total_wait / self._items * 1000.0, 2) if self._items else 0.0,
+            }
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != pid or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="whisper-batcher", daemon=True)
+                self._worker_pid = pid
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._window
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._max_seen = max(self._max_seen, len(batch))
+                self._size_counts[len(batch)] = self._size_counts.get(len(batch), 0) + 1
+                self._total_wait += sum(started - job.enqueued_at for job in batch)
+
+            try:
+                results = self._batch_fn([job.item for job in batch])
+                for job, result in zip(batch, results):
+                    job.result = result
+            except Exception as e:
+                for job in batch:
+                    job.error = e
+            finally:
+                for job in batch:
+                    job.done.set()
@@ -0,0 +1,92 @@
+"""
+Parallel transcription of long recordings for the Whisper API.
+
+Whisper processes audio in sequential 30 second windows, so a long recording
+takes time proportional to its length. Long audio is instead cut into chunks
+of at most `max_chunk_sec`, each cut placed at the quietest point (smoothed
+frame level) in the second half of the allowed range so words are not split.
+The chunks are handed to `transcribe_batch_fn` in groups of `batch_size`,
+which decodes each group as one batch (one encoder pass over all of its
+chunks) where the engine supports it, and the text and segment timestamps are
+stitched back together. The chunks are never run as concurrent transcribe()
+calls on the shared model, which openai-whisper does not support.
+"""
+import numpy as np
+
+from audio_io import SAMPLE_RATE
+from vad import FRAME_MS, frame_levels_db
+
+SMOOTHING_MS = 300  # Pauses shorter than this are not considered for cuts
+
+
+def find_split_points(audio, max_chunk_sec=30.0, min_chunk_sec=15.0):
+    """Returns the sample indices at which the audio should be cut."""
+    frame_samples = SAMPLE_RATE * FRAME_MS // 1000
+    levels = frame_levels_db(audio, frame_samples)
+    kernel = max(1, SMOOTHING_MS // FRAME_MS)
+    smoothed = np.convolve(levels, np.ones(kernel) / kernel, mode="same")
+
+    max_frames = int(max_chunk_sec * 1000 / FRAME_MS)
+    min_frames = min(int(min_chunk_sec * 1000 / FRAME_MS), max_frames - 1)
+    total_frames = len(audio) / frame_samples
+
+    points = []
+    start = 0
+    while total_frames - start > max_frames:
+        low = start + min_frames
+        high = min(start + max_frames, len(smoothed))
+        if high <= low:
+            break
+        cut = low + int(np.argmin(smoothed[low:high]))
+        points.append(cut * frame_samples)
+        start = cut
+    return points
+
+
+def split_on_silence(audio, max_chunk_sec=30.0, min_chunk_sec=15.0):
+    """Returns a list of (offset_samples, chunk) tuples."""
+    bounds = [0] + find_split_points(audio, max_chunk_sec, min_chunk_sec) + [len(audio)]
+    return [(start, audio[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def transcribe_chunks(audio, options, transcribe_batch_fn, batch_size=4, max_chunk_sec=30.0, min_chunk_sec=15.0):
+    """
+    Transcribes the chunks of a long recording in batches of `batch_size`.
+    `transcribe_batch_fn([(chunk, options), ...])` must return one
+    Whisper-style result dict per chunk. Segment timestamps in the stitched
+    result are relative to the full recording.
+    """
+    chunks = split_on_silence(audio, max_chunk_sec, min_chunk_sec)
+    batch_size = max(1, int(batch_size))
+    results = []
+    for start in range(0, len(chunks), batch_size):
+        results.extend(transcribe_batch_fn([(chunk, options) for _, chunk in chunks[start:start + batch_size]]))
+
+    texts = []
+    segments = []
+    language = options.get("language")
+    for (offset, chunk), result in zip(chunks, results):
+        offset_sec = offset / SAMPLE_RATE
+        language = language or result.get("language")
+        texts.append(result["text"].strip())
+
+        chunk_segments = result.get("segments") or [{
+            "start": 0.0,
+            "end": len(chunk) / SAMPLE_RATE,
+            "text": result["text"],
+            "avg_logprob": result.get("avg_logprob", 0.0),
+        }]
+        for segment in chunk_segments:
+            segments.append({
+                "start": round(offset_sec + segment["start"], 2),
+                "end": round(offset_sec + segment["end"], 2),
+                "text": segment["text"].strip(),
+                "avg_logprob": segment.get("avg_logprob", 0.0),
+            })
+
+    return {
+        "text": " ".join(text for text in texts if text),
+        "language": language,
+        "segments": segments,
+        "chunks": len(chunks),
+    }
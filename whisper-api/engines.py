@@ -0,0 +1,281 @@
+"""
+Inference engines for the Whisper API.
+
+The engine is selected with WHISPER_ENGINE:
+    openai       openai-whisper on PyTorch (fp32 on CPU, fp16 on CUDA). Default.
+    ctranslate2  faster-whisper on CTranslate2, int8-quantized by default
+                 (WHISPER_COMPUTE_TYPE), which makes larger models usable on CPU.
+
+Every engine returns results shaped like openai-whisper's transcribe():
+{"text", "language", "segments": [{"start", "end", "text", "avg_logprob"}]}.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from audio_io import SAMPLE_RATE
+
+CHUNK_SAMPLES = 30 * SAMPLE_RATE  # Whisper's fixed input window
+
+
+def process_rss_bytes():
+    """Resident set size of the current process (Linux), or 0 if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class WhisperEngine:
+    """Base class: loads a model and exposes transcription and language detection."""
+
+    name = "base"
+    supports_batching = False
+    # Whether a model loaded before fork() keeps working in the forked workers
+    fork_safe = True
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.device = "cpu"
+        self.compute_type = "float32"
+        self.load_seconds = None
+        self.model_memory_bytes = 0
+        self._loaded_pid = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        rss_before = process_rss_bytes()
+        started = time.perf_counter()
+        self._load()
+        self.load_seconds = time.perf_counter() - started
+        self.model_memory_bytes = self._model_memory_bytes(max(0, process_rss_bytes() - rss_before))
+        self._loaded_pid = os.getpid()
+
+    def is_loaded(self):
+        """True if the model is usable in this process."""
+        return self._loaded_pid is not None and (self.fork_safe or self._loaded_pid == os.getpid())
+
+    def ensure_loaded(self):
+        """Loads the model unless it is already usable in this process; concurrent callers wait for one load."""
+        if self.is_loaded():
+            return
+        with self._load_lock:
+            if not self.is_loaded():
+                print(f"Loading {self.name} model '{self.model_name}' in process {os.getpid()}...")
+                self.load()
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _model_memory_bytes(self, rss_delta):
+        return rss_delta
+
+    def transcribe(self, audio, **options):
+        raise NotImplementedError
+
+    def detect_language(self, audio):
+        """Returns (language, probability) for the first 30 s of audio."""
+        raise NotImplementedError
+
+    def transcribe_batch(self, items):
+        """Transcribes a list of (audio, options) items of at most 30 s each."""
+        raise NotImplementedError
+
+    def info(self):
+        return {
+            "engine": self.name,
+            "model": self.model_name,
+            "device": self.device,
+            "compute_type": self.compute_type,
+            "load_seconds": round(self.load_seconds, 2) if self.load_seconds is not None else None,
+            "model_memory_mb": round(self.model_memory_bytes / 2**20, 1),
+            "process_rss_mb": round(process_rss_bytes() / 2**20, 1),
+        }
+
+
+class OpenAIWhisperEngine(WhisperEngine):
+    """The reference openai-whisper implementation on PyTorch."""
+
+    name = "openai"
+    supports_batching = True
+
+    def __init__(self, model_name):
+        super().__init__(model_name)
+        # openai-whisper is not thread-safe (the decoder's kv-cache hooks live on the
+        # shared modules), so every inference call in the process is serialized
+        self._inference_lock = threading.RLock()
+
+    def _load(self):
+        import whisper
+
+        self._whisper = whisper
+        self.model = whisper.load_model(self.model_name)
+        self.device = self.model.device.type
+        self.compute_type = "float16" if self.device == "cuda" else "float32"
+        self._instrument()
+
+    def _instrument(self):
+        """
+        Times encoder and decoder forward passes with module hooks. Inside
+        transcribe() the time up to the first encoder pass is the mel computation.
+        """
+        local = self._local = threading.local()
+
+        def pre_hook(stage_name):
+            def hook(module, inputs):
+                now = time.perf_counter()
+                if stage_name == "encoder" and getattr(local, "transcribe_started", None) is not None:
+                    metrics.add_stage_time("mel", now - local.transcribe_started)
+                    local.transcribe_started = None
+                setattr(local, stage_name, now)
+            return hook
+
+        def post_hook(stage_name):
+            def hook(module, inputs, output):
+                metrics.add_stage_time(stage_name, time.perf_counter() - getattr(local, stage_name))
+            return hook
+
+        for stage_name, module in (("encoder", self.model.encoder), ("decoder", self.model.decoder)):
+            module.register_forward_pre_hook(pre_hook(stage_name))
+            module.register_forward_hook(post_hook(stage_name))
+
+    def _model_memory_bytes(self, rss_delta):
+        # Weights may live on the GPU, so count parameters instead of RSS
+        return sum(p.numel() * p.element_size() for p in self.model.parameters())
+
+    def _mel(self, audio):
+        with metrics.stage("mel"):
+            return self._whisper.log_mel_spectrogram(self._whisper.pad_or_trim(audio), self.model.dims.n_mels)
+
+    def transcribe(self, audio, **options):
+        with self._inference_lock:
+            self._local.transcribe_started = time.perf_counter()
+            try:
+                return self.model.transcribe(audio, **options)
+            finally:
+                self._local.transcribe_started = None
+
+    def detect_language(self, audio):
+        with self._inference_lock:
+            _, probs = self.model.detect_language(self._mel(audio).to(self.model.device))
+        language = max(probs, key=probs.get)
+        return language, probs[language]
+
+    def transcribe_batch(self, items):
+        """
+        Log-mel spectrograms are stacked so every language group runs one
+        batched encoder pass and one batched greedy decode.
+        """
+        import torch
+
+        results = [None] * len(items)
+        groups = {}
+        for index, (_, options) in enumerate(items):
+            groups.setdefault(options.get("language"), []).append(index)
+
+        with metrics.trace(), self._inference_lock:
+            for language, indices in groups.items():
+                mel = torch.stack([self._mel(items[i][0]) for i in indices]).to(self.model.device)
+                decode_options = self._whisper.DecodingOptions(language=language, fp16=self.device == "cuda")
+                for i, decoded in zip(indices, self._whisper.decode(self.model, mel, decode_options)):
+                    results[i] = {"text": decoded.text, "language": decoded.language, "avg_logprob": decoded.avg_logprob}
+        return results
+
+    def info(self):
+        import torch
+
+        info = super().info()
+        info["torch_threads"] = torch.get_num_threads()
+        return info
+
+
+class CTranslate2Engine(WhisperEngine):
+    """
+    faster-whisper on CTranslate2. CTranslate2 keeps its own thread pool, which
+    does not survive fork(), so each worker loads its own copy after the fork
+    (the int8 weights are a fraction of the fp32 model) and the master skips
+    the load. Encoder and decoder run inside CTranslate2, so only
+    whole-request timings are available.
+    """
+
+    name = "ctranslate2"
+    fork_safe = False
+
+    def __init__(self, model_name, device="cpu", compute_type="int8", beam_size=1):
+        super().__init__(model_name)
+        self.device = device
+        self.compute_type = compute_type
+        self.beam_size = beam_size
+        self._model = None
+
+    def _load(self):
+        from faster_whisper import WhisperModel
+
+        cpu_threads = int(os.environ.get("WHISPER_CPU_THREADS", "0"))
+        self._model = WhisperModel(
+            self.model_name,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=cpu_threads,
+        )
+
+    def _process_model(self):
+        # Normally loaded in gunicorn's post_fork; this covers `python app.py` and failed worker loads
+        self.ensure_loaded()
+        return self._model
+
+    def transcribe(self, audio, **options):
+        kwargs = {"beam_size": self.beam_size}
+        for key in ("language", "initial_prompt", "temperature", "condition_on_previous_text"):
+            if options.get(key) is not None:
+                kwargs[key] = options[key]
+        segments, info = self._process_model().transcribe(audio, **kwargs)
+        segments = [
+            {"start": s.start, "end": s.end, "text": s.text, "avg_logprob": s.avg_logprob}
+            for s in segments
+        ]
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "language": info.language,
+            "segments": segments,
+        }
+
+    def detect_language(self, audio):
+        model = self._process_model()
+        # The encoder takes exactly 30 s of features: pad short clips like openai-whisper's pad_or_trim
+        window = np.zeros(CHUNK_SAMPLES, dtype=np.float32)
+        clip = np.asarray(audio[:CHUNK_SAMPLES], dtype=np.float32)
+        window[:len(clip)] = clip
+        with metrics.stage("mel"):
+            features = model.feature_extractor(window)
+        with metrics.stage("encoder"):
+            encoder_output = model.encode(features[:, :model.feature_extractor.nb_max_frames])
+        token, probability = model.model.detect_language(encoder_output)[0][0]
+        return token[2:-2], probability
+
+
+def create_engine(engine_name, model_name, forking=False):
+    """
+    Creates the engine selected by WHISPER_ENGINE and loads its model, unless
+    `forking` (workers will be forked from this process) and the model would
+    not survive the fork; then each worker loads it with ensure_loaded().
+    """
+    engine_name = (engine_name or "openai").lower()
+    if engine_name in ("openai", "openai-whisper", "pytorch"):
+        engine = OpenAIWhisperEngine(model_name)
+    elif engine_name in ("ctranslate2", "faster-whisper", "ct2"):
+        engine = CTranslate2Engine(
+            model_name,
+            device=os.environ.get("WHISPER_DEVICE", "cpu"),
+            compute_type=os.environ.get("WHISPER_COMPUTE_TYPE", "int8"),
+            beam_size=int(os.environ.get("WHISPER_BEAM_SIZE", "1")),
+        )
+    else:
+        raise ValueError(f"Unknown WHISPER_ENGINE '{engine_name}' (expected 'openai' or 'ctranslate2')")
+    if engine.fork_safe or not forking:
+        engine.load()
+    return engine
@@ -0,0 +1,88 @@
+"""
+Gunicorn configuration for the Whisper API (production serving mode).
+
+The app, and with it the Whisper model, is imported once in the master process
+(preload_app) and the workers are forked afterwards, so the model weights are
+shared copy-on-write instead of being loaded once per worker. Workers only
+accept a new connection when they have a free thread, so the shared listening
+socket hands every request to an idle worker.
+
+Environment variables:
+    WHISPER_PORT            Port to bind (default 9000)
+    WHISPER_WORKERS         Number of worker processes (default: CPUs available to the container)
+    WHISPER_WORKER_THREADS  Request threads per worker (default 1, or WHISPER_BATCH_MAX_SIZE with
+                            WHISPER_BATCHING=true: batches only form from requests waiting in one worker)
+    WHISPER_TORCH_THREADS   torch (and CTranslate2) threads per worker (default: CPUs / workers)
+    WHISPER_TIMEOUT         Worker timeout in seconds (default 600, /stream sessions hold a worker)
+"""
+import gc
+import os
+import sys
+
+
+def _available_cpus():
+    """Container CPU quota; coqui-tts-api/cpu_profile.py has the same function (`available_cpus`)."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:  # cgroup v2
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:  # cgroup v1
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, int(quota / period))
+    except (OSError, ValueError):
+        pass
+    return len(os.sched_getaffinity(0))
+
+
+cpus = _available_cpus()
+
+bind = f"0.0.0.0:{os.environ.get('WHISPER_PORT', '9000')}"
+workers = int(os.environ.get("WHISPER_WORKERS", cpus))
+batching = os.environ.get("WHISPER_BATCHING", "false").lower() == "true"
+# More than one thread switches gunicorn from the sync to the gthread worker
+threads = int(os.environ.get("WHISPER_WORKER_THREADS",
+                             os.environ.get("WHISPER_BATCH_MAX_SIZE", "8") if batching else "1"))
+# Never accept more connections than there are threads to run them
+worker_connections = threads
+timeout = int(os.environ.get("WHISPER_TIMEOUT", "600"))
+preload_app = True
+torch_threads = int(os.environ.get("WHISPER_TORCH_THREADS", max(1, cpus // workers)))
+
+# Keep the master single-threaded while it loads the model: OpenMP thread
+# pools created before fork() are not usable in the forked workers.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+# Tells app.py that workers are forked from the master, so engines whose model
+# does not survive fork() (CTranslate2) skip the load there; see post_fork
+os.environ["WHISPER_PREFORK"] = "1"
+
+
+def when_ready(server):
+    # Move everything allocated during preload (model included) out of the
+    # collector's reach, so GC passes in the workers don't touch those pages.
+    gc.freeze()
+    server.log.info(f"Starting {workers} worker(s) x {threads} thread(s), {torch_threads} torch thread(s) each")
+    if batching and threads == 1:
+        server.log.warning("WHISPER_BATCHING is enabled but WHISPER_WORKER_THREADS=1: every batch holds a "
+                           "single request and only adds the batch window as latency")
+
+
+def post_fork(server, worker):
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    # Picked up by the CTranslate2 engine, which loads its model per worker
+    os.environ["WHISPER_CPU_THREADS"] = str(torch_threads)
+    server.log.info(f"Worker {worker.pid}: torch intra-op threads set to {torch_threads}")
+
+    # Load per-process models (CTranslate2) now rather than on the worker's first request
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        app_module.load_worker_model()
@@ -0,0 +1,89 @@
+"""
+Per-client language cache for the Whisper API.
+
+With WHISPER_LANGUAGE=auto every request would otherwise pay for a language
+detection pass, although a satellite almost always hears the same language.
+The cache remembers the last detected language per client key together with
+its detection probability. The stored confidence decays with a configurable
+half-life; an entry is only used while its decayed confidence stays above the
+threshold, and every successful decode with the cached language refreshes it.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LanguageCache:
+    """Small thread-safe LRU of client key -> (language, confidence, updated_at)."""
+
+    def __init__(self, max_entries=256, half_life_sec=21600.0, min_confidence=0.8):
+        self._max_entries = max(1, int(max_entries))
+        self._half_life = float(half_life_sec)
+        self._min_confidence = float(min_confidence)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def _decayed(self, confidence, updated_at, now):
+        if self._half_life <= 0:
+            return confidence
+        return confidence * 0.5 ** ((now - updated_at) / self._half_life)
+
+    def lookup(self, key):
+        """Returns the cached language if its decayed confidence is high enough, else None."""
+        with self._lock:
+            language = self._usable_locked(key)
+            if language is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return language
+
+    def peek(self, key):
+        """Like lookup(), without counting it or refreshing the entry's LRU position."""
+        with self._lock:
+            return self._usable_locked(key)
+
+    def _usable_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        language, confidence, updated_at = entry
+        if self._decayed(confidence, updated_at, time.monotonic()) < self._min_confidence:
+            return None
+        return language
+
+    def update(self, key, language, confidence):
+        """Stores a fresh detection result."""
+        with self._lock:
+            self._entries[key] = (language, float(confidence), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def confirm(self, key):
+        """Resets the decay of an entry after its language decoded well."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], entry[1], time.monotonic())
+
+    def reject(self, key):
+        """Drops an entry whose language decoded poorly."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self.fallbacks += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "fallbacks": self.fallbacks,
+                # A hit that had to fall back still ran a detection pass
+                "detections_saved": self.hits - self.fallbacks,
+            }
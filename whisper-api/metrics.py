@@ -0,0 +1,188 @@
+"""
+Prometheus metrics for the Whisper API.
+
+A deliberately small, dependency-free implementation of counters, gauges and
+histograms rendered in the Prometheus text exposition format. Observing a
+value is a lock, a bisect and two additions, so the instrumentation adds
+microseconds to a request.
+
+Per-stage timings are collected with `stage()` / `add_stage_time()`. Inside a
+`trace()` block the stage times of one request are summed first and observed
+once when the block ends (the decoder runs once per token); outside a trace
+they are observed directly.
+
+Every gunicorn worker keeps its own metrics; a scrape returns the values of
+the worker that happened to serve it.
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] += amount
+
+    def collect(self, kind="counter"):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(zip(self.labelnames, key))} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def collect(self, kind="gauge"):
+        return super().collect(kind)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=STAGE_BUCKETS, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # Per label key: [bucket counts (non-cumulative, +Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(labels + [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "whisper_stage_seconds",
+    "Time spent per request in each processing stage.",
+    labelnames=("stage",),
+)
+REQUEST_SECONDS = Histogram("whisper_request_seconds", "Total /transcribe processing time.")
+REAL_TIME_FACTOR = Histogram(
+    "whisper_real_time_factor",
+    "Processing time divided by audio duration per request.",
+    buckets=RTF_BUCKETS,
+)
+AUDIO_SECONDS = Counter("whisper_audio_seconds_total", "Seconds of audio received for transcription.")
+REQUESTS = Counter("whisper_requests_total", "Transcription requests by outcome.", labelnames=("status",))
+IN_FLIGHT = Gauge("whisper_requests_in_flight", "Transcription requests currently being processed.")
+MODEL_LOAD_SECONDS = Gauge("whisper_model_load_seconds", "Time it took to load the model.")
+
+_registry = [STAGE_SECONDS, REQUEST_SECONDS, REAL_TIME_FACTOR, AUDIO_SECONDS, REQUESTS, IN_FLIGHT, MODEL_LOAD_SECONDS]
+_gauge_callbacks = []
+_local = threading.local()
+
+
+def register(metric):
+    """Adds a metric to the /metrics output."""
+    _registry.append(metric)
+    return metric
+
+
+def register_gauge_callback(name, documentation, callback):
+    """Adds a gauge whose value is read from `callback()` at scrape time."""
+    _gauge_callbacks.append((name, documentation, callback))
+
+
+def add_stage_time(stage_name, seconds):
+    """Adds time to a stage of the current request (or observes it directly outside a trace)."""
+    current = getattr(_local, "trace", None)
+    if current is not None:
+        current[stage_name] += seconds
+    else:
+        STAGE_SECONDS.observe(seconds, stage=stage_name)
+
+
+@contextmanager
+def stage(stage_name):
+    """Times the enclosed block as `stage_name`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage_time(stage_name, time.perf_counter() - started)
+
+
+@contextmanager
+def trace():
+    """Sums stage times of the enclosed request and observes each stage once at the end."""
+    previous = getattr(_local, "trace", None)
+    _local.trace = defaultdict(float)
+    try:
+        yield
+    finally:
+        collected, _local.trace = _local.trace, previous
+        for stage_name, seconds in collected.items():
+            add_stage_time(stage_name, seconds)
+
+
+def render():
+    """Returns all metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    for name, documentation, callback in _gauge_callbacks:
+        try:
+            value = callback()
+        except Exception:
+            continue
+        if value is None:
+            continue
+        lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"])
+    return "\n".join(lines) + "\n"
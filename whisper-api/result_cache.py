@@ -0,0 +1,154 @@
+"""
+Content-addressed transcription cache for the Whisper API.
+
+Backend retries and clients re-uploading the same clip would otherwise be
+transcribed again from scratch. Results are keyed by a BLAKE2 hash of the
+decoded PCM together with every option that influences decoding, and kept in
+an in-memory LRU bounded by the size of the serialized results. An optional
+on-disk tier (one JSON file per key, written atomically) survives restarts
+and is shared by all worker processes.
+
+coqui-tts-api/audio_cache.py keeps a copy of the LRU and the disk tier for
+synthesized audio; fixes to either belong in both.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def make_key(audio, options):
+    """Hashes float32 PCM samples and the decoding options into a cache key."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(memoryview(np.ascontiguousarray(audio, dtype=np.float32)).cast("B"))
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """LRU of JSON-serializable results under a byte budget, with an optional disk tier."""
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self._max_bytes = int(max_bytes)
+        self._entries = OrderedDict()  # key -> (result, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_dir = disk_dir or None
+        self._disk_max_bytes = int(disk_max_bytes)
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self._disk_dir:
+            os.makedirs(self._disk_dir, exist_ok=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self._disk_dir) if entry.name.endswith(".json"))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        self._insert(key, result, len(json.dumps(result)))
+        return result
+
+    def put(self, key, result):
+        serialized = json.dumps(result)
+        self._insert(key, result, len(serialized))
+        if self._disk_dir:
+            self._write_disk(key, serialized)
+
+    def _insert(self, key, result, size):
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while self._bytes > self._max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def _path(self, key):
+        return os.path.join(self._disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self._disk_dir:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, serialized):
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        data = serialized.encode("utf-8")
+        try:
+            # An existing entry (e.g. written by another worker) is replaced, not added
+            try:
+                replaced_size = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced_size = 0
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Failed to write transcription cache entry {path}: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += len(data) - replaced_size
+            over_budget = self._disk_max_bytes and self._disk_bytes > self._disk_max_bytes
+        if over_budget:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Removes the oldest files until the disk tier is back under 90% of its budget."""
+        entries = []
+        for entry in os.scandir(self._disk_dir):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = self._disk_max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "disk_bytes": self._disk_bytes if self._disk_dir else None,
+            }
@@ -0,0 +1,126 @@
+"""
+Incremental (streaming) transcription for the Whisper API.
+
+Audio arrives as 16 kHz mono s16le PCM frames. Every `step_sec` seconds of new
+audio the current window (everything after the last committed segment) is
+decoded again. Words on which two consecutive hypotheses agree are reported as
+stable, the remainder as unstable. Once the window grows beyond
+`max_window_sec`, all but the last segment are committed and the window slides
+forward, so a single decode step never has to process the whole utterance.
+"""
+import re
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE, BYTES_PER_SAMPLE, pcm16_to_float32
+
+_WORD_NORMALIZE_RE = re.compile(r"[^\w']+")
+
+
+def _normalize_word(word):
+    return _WORD_NORMALIZE_RE.sub("", word.lower())
+
+
+def _common_prefix_length(previous, current):
+    """Number of leading words two hypotheses agree on (ignoring case and punctuation)."""
+    length = 0
+    for a, b in zip(previous, current):
+        if _normalize_word(a) != _normalize_word(b):
+            break
+        length += 1
+    return length
+
+
+class StreamingTranscriber:
+    """
+    Re-decodes a sliding window of streamed audio and tracks stable text.
+
+    `transcribe_fn` is called as `transcribe_fn(audio, **options)` and must
+    return a Whisper result dict (`text`, `segments`, `language`).
+    """
+
+    def __init__(self, transcribe_fn, options, step_sec=1.0, max_window_sec=15.0, min_decode_sec=0.5):
+        self._transcribe = transcribe_fn
+        self._options = dict(options)
+        self._step_samples = int(step_sec * SAMPLE_RATE)
+        self._max_window_samples = int(max_window_sec * SAMPLE_RATE)
+        self._min_decode_samples = int(min_decode_sec * SAMPLE_RATE)
+
+        self._window = np.zeros(0, dtype=np.float32)  # Audio after the last committed segment
+        self._remainder = b""  # Trailing odd byte of an incomplete sample
+        self._pending_samples = 0  # Samples received since the last decode step
+        self._committed_text = ""  # Raw Whisper text of committed segments
+        self._previous_words = []
+        self._stable_words = []
+        self.decode_steps = 0
+
+    def feed(self, pcm_bytes):
+        """
+        Adds PCM bytes to the window. Returns a partial hypothesis dict when a
+        decode step was run, otherwise None.
+        """
+        data = self._remainder + pcm_bytes
+        usable = len(data) - (len(data) % BYTES_PER_SAMPLE)
+        self._remainder = data[usable:]
+        if usable == 0:
+            return None
+
+        samples = pcm16_to_float32(data[:usable])
+        self._window = np.concatenate((self._window, samples))
+        self._pending_samples += len(samples)
+
+        if self._pending_samples < self._step_samples or len(self._window) < self._min_decode_samples:
+            return None
+        return self._decode_step()
+
+    def finish(self):
+        """Decodes what is left in the window and returns the full transcription text."""
+        if len(self._window) == 0:
+            return self._committed_text
+        result = self._transcribe(self._window, **self._options)
+        self.decode_steps += 1
+        return self._committed_text + result["text"]
+
+    def _decode_step(self):
+        self._pending_samples = 0
+        options = dict(self._options)
+        # Partial hypotheses are throw-away, so skip the temperature fallback loop
+        options["temperature"] = 0.0
+        if self._committed_text:
+            options["initial_prompt"] = self._committed_text[-200:]
+
+        result = self._transcribe(self._window, **options)
+        self.decode_steps += 1
+
+        # Lock the language after the first detection so later steps skip the detect pass
+        if not self._options.get("language") and result.get("language"):
+            self._options["language"] = result["language"]
+
+        words = result["text"].split()
+        agreed = _common_prefix_length(self._previous_words, words)
+        if agreed > len(self._stable_words):
+            self._stable_words = words[:agreed]
+        self._previous_words = words
+
+        if len(self._window) > self._max_window_samples:
+            self._commit_segments(result.get("segments", []))
+
+        stable = (self._committed_text.strip() + " " + " ".join(self._stable_words)).strip()
+        unstable = " ".join(self._previous_words[len(self._stable_words):])
+        return {"event": "partial", "stable": stable, "unstable": unstable}
+
+    def _commit_segments(self, segments):
+        """Commits all but the last segment and slides the window past them."""
+        if len(segments) < 2:
+            return
+        committed = segments[:-1]
+        cut = int(committed[-1]["end"] * SAMPLE_RATE)
+        if cut <= 0:
+            return
+
+        text = "".join(segment["text"] for segment in committed)
+        committed_words = len(text.split())
+        self._committed_text += text
+        self._window = self._window[cut:]
+        self._stable_words = self._stable_words[committed_words:]
+        self._previous_words = self._previous_words[committed_words:]
@@ -0,0 +1,69 @@
+"""
+Energy-based voice activity detection for the Whisper API.
+
+Clips from the satellites carry up to a couple of seconds of silence before
+and after the command. The audio is cut into fixed frames in one reshape, the
+per-frame level is compared against an adaptive threshold derived from the
+clip's own noise floor, and everything outside the first and last voiced frame
+(plus some padding) is dropped before Whisper sees it.
+"""
+import numpy as np
+
+from audio_io import SAMPLE_RATE
+
+FRAME_MS = 30
+
+
+def frame_levels_db(audio, frame_samples):
+    """Returns the RMS level in dBFS of every complete frame."""
+    count = len(audio) // frame_samples
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:count * frame_samples].reshape(count, frame_samples)
+    power = np.einsum("ij,ij->i", frames, frames) / frame_samples
+    return 10.0 * np.log10(power + 1e-10)
+
+
+def trim_silence(audio, margin_db=12.0, floor_dbfs=-50.0, min_speech_ms=200, padding_ms=250):
+    """
+    Trims leading and trailing silence.
+
+    A frame counts as voiced when it is at least `margin_db` above the clip's
+    noise floor (10th percentile level) and above `floor_dbfs`. Returns
+    `(trimmed_audio, info)`; `trimmed_audio` is None when the clip holds less
+    than `min_speech_ms` of voiced frames.
+    """
+    frame_samples = SAMPLE_RATE * FRAME_MS // 1000
+    input_sec = len(audio) / SAMPLE_RATE
+    levels = frame_levels_db(audio, frame_samples)
+
+    def info(output_samples, speech_frames):
+        output_sec = output_samples / SAMPLE_RATE
+        # Plain Python types, the dict ends up in the JSON response
+        return {
+            "speech_detected": bool(output_samples > 0),
+            "input_sec": round(float(input_sec), 3),
+            "output_sec": round(float(output_sec), 3),
+            "trimmed_sec": round(float(input_sec - output_sec), 3),
+            "speech_sec": round(float(speech_frames * FRAME_MS / 1000.0), 3),
+        }
+
+    if len(levels) == 0:
+        return None, info(0, 0)
+
+    noise_floor, median, loud = np.percentile(levels, [10, 50, 90])
+    if loud - noise_floor < margin_db:
+        # No quiet part to measure a floor against: either all speech or all silence
+        if median > floor_dbfs:
+            return audio, info(len(audio), len(levels))
+        return None, info(0, 0)
+
+    threshold = max(noise_floor + margin_db, floor_dbfs)
+    voiced = np.flatnonzero(levels > threshold)
+    if len(voiced) * FRAME_MS < min_speech_ms:
+        return None, info(0, len(voiced))
+
+    padding_frames = int(np.ceil(padding_ms / FRAME_MS))
+    start = max(0, voiced[0] - padding_frames) * frame_samples
+    end = min(len(audio), (voiced[-1] + 1 + padding_frames) * frame_samples)
+    return audio[start:end], info(end - start, len(voiced))